@@ -0,0 +1,320 @@
+"""
+Benchmarks of the building of python2latex objects at various sizes. Only tex and csv files are produced, so pdflatex
+is not needed.
+
+Each benchmark is run on a list of sizes. The wall time and the peak memory allocated by Python (measured with
+tracemalloc in a separate run, since tracing slows down execution) are reported for each size. The results are
+written as JSON so that runs can be compared with each other.
+
+Usage:
+    python benchmarks/run_benchmarks.py --preset quick --output results.json
+    python benchmarks/run_benchmarks.py --preset full --output new.json --compare results.json
+    python benchmarks/run_benchmarks.py --benchmarks table_build plot_build --repeat 3
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import tracemalloc
+from time import perf_counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from version import version
+from python2latex import Document, Section, Subsection, Table, Plot, Template, TexEnvironment, build
+from python2latex.tex_environment import _is_streamable
+
+
+def bench_table_build(size, workdir):
+    """
+    Builds a table of shape 'size' with rules, formats, highlights and multicells.
+    """
+    n_rows, n_cols = size
+    table = Table((n_rows + 1, n_cols), float_format='.3f', caption='Benchmark table', label='benchmark')
+    table[0] = [f'Column {j}' for j in range(n_cols)]
+    table[0].add_rule()
+    table[1:, :] = np.random.RandomState(42).rand(n_rows, n_cols)
+    table[1:, 0].change_format('.1e')
+    for i in range(1, n_rows + 1, 10):
+        table[i, 1:].highlight_best('high', 'bold')
+        table[i].add_rule(trim_left=True)
+    table[1:min(n_rows, 5) + 1, 0].multicell('Multicell', v_shift='-2pt')
+    return table.build
+
+
+def bench_plot_build(size, workdir):
+    """
+    Builds a plot of two curves of 'size' points in total, which saves them to a csv.
+    """
+    X = np.linspace(0, 1, size // 2)
+    plot = Plot(plot_name='benchmark_plot', plot_path=workdir, caption='Benchmark plot')
+    plot.add_plot(X, np.sin(X), 'red', legend='sin')
+    plot.add_plot(X, np.cos(X), 'blue', legend='cos')
+    return plot.build
+
+
+def bench_matrix_plot_build(size, workdir):
+    """
+    Builds a matrix plot of shape 'size', which saves it to a csv.
+    """
+    n_x, n_y = size
+    X = np.linspace(0, 1, n_x)
+    Y = np.linspace(0, 1, n_y)
+    Z = np.random.RandomState(42).rand(n_x, n_y)
+    plot = Plot(plot_name='benchmark_matrix_plot', plot_path=workdir)
+    plot.add_matrix_plot(X, Y, Z)
+    return plot.build
+
+
+def bench_raster_matrix_plot_build(size, workdir):
+    """
+    Builds a matrix plot of shape 'size' in raster mode, which saves it to a png.
+    """
+    n_x, n_y = size
+    plot = Plot(plot_name='benchmark_raster_matrix_plot', plot_path=workdir)
+    plot.add_matrix_plot(np.arange(n_x), np.arange(n_y), np.random.RandomState(42).rand(n_x, n_y), raster=True)
+    return plot.build
+
+
+def bench_template_render(size, workdir):
+    """
+    Renders a template of 'size' lines of text with a table and a plot inserted at anchors.
+    """
+    lines = [r'\documentclass{article}', r'\begin{document}']
+    for i in range(size):
+        lines.append(f'Line {i} of text of the existing document.')
+        if i == size // 3:
+            lines.append('%! python2latex-anchor = table')
+        if i == 2 * size // 3:
+            lines.append('%! python2latex-anchor = plot')
+    lines.append(r'\end{document}')
+    with open(os.path.join(workdir, 'benchmark_template.tex'), 'w', encoding='utf8') as file:
+        file.write('\n'.join(lines))
+
+    template = Template('benchmark_template', filepath=workdir)
+    table = Table((10, 5))
+    table[:, :] = np.arange(50).reshape(10, 5)
+    template.anchors['table'] = table
+    plot = Plot(np.arange(100), plot_name='benchmark_template_plot', plot_path=workdir)
+    template.anchors['plot'] = plot
+    return lambda: template.render(compile_to_pdf=False, show_pdf=False)
+
+
+def bench_deep_document_build(size, workdir):
+    """
+    Builds a document made of 'size' nested environments.
+    """
+    doc = Document('benchmark_deep', filepath=workdir)
+    env = doc
+    for i in range(size):
+        env = env.new(TexEnvironment('env', label=f'env{i}'))
+        env += f'Text of environment {i}.'
+    return lambda: doc.build(compile_to_pdf=False, show_pdf=False)
+
+
+def bench_wide_document_build(size, workdir):
+    """
+    Builds a document of 'size' sections, each containing a subsection, text and a small table.
+    """
+    doc = Document('benchmark_wide', filepath=workdir)
+    for i in range(size):
+        section = doc.new(Section(f'Section {i}', label=f'sec{i}'))
+        section += f'Text of section {i}.'
+        subsection = section.new(Subsection(f'Subsection {i}'))
+        subsection += 'Text of the subsection.'
+        table = section.new(Table((3, 3)))
+        table[:, :] = [[i, i + 1, i + 2]] * 3
+    return lambda: doc.build(compile_to_pdf=False, show_pdf=False)
+
+
+def _sections_tree(size, root=None):
+    """
+    Returns an environment, or fills 'root', with 'size' sections of 10 subsections of text, the typical shape of a
+    large report.
+    """
+    root = TexEnvironment('root') if root is None else root
+    for i in range(size):
+        section = root.new(Section(f'Section {i}'))
+        section += f'Text of section {i}.'
+        for j in range(10):
+            subsection = section.new(Subsection(f'Subsection {j}'))
+            subsection += 'Text of the subsection.'
+    return root
+
+
+def _recursive_build(obj):
+    """
+    Reference builder recursing into the environments, as they were built before the explicit-stack walker of
+    'TexEnvironment.iter_build'. It gives the same tex.
+    """
+    if not _is_streamable(obj):
+        return build(obj)
+    return '\n'.join(tex for tex in map(_recursive_build, obj._build_parts()) if tex)
+
+
+def bench_walker_build(size, workdir):
+    """
+    Builds a tree of 'size' sections of 10 subsections with the explicit-stack walker of 'TexEnvironment.build'.
+    Compare with 'recursive_build' to see the overhead per node of the walker.
+    """
+    return _sections_tree(size).build
+
+
+def bench_recursive_build(size, workdir):
+    """
+    Builds the same tree as 'walker_build' with the reference recursive builder.
+    """
+    root = _sections_tree(size)
+    return lambda: _recursive_build(root)
+
+
+def bench_sections_document_build(size, workdir):
+    """
+    Builds a document of 'size' sections of 10 subsections, including the collection of its packages and preamble.
+    """
+    doc = _sections_tree(size, Document('benchmark_sections', filepath=workdir))
+    return lambda: doc.build(save_to_disk=False, compile_to_pdf=False, show_pdf=False)
+
+
+# Benchmark name: (function, sizes of the 'quick' preset, sizes of the 'full' preset).
+BENCHMARKS = {
+    'table_build': (bench_table_build, [(10, 10), (100, 10)], [(10, 10), (100, 10), (1000, 20), (10000, 50)]),
+    'plot_build': (bench_plot_build, [10**3, 10**4], [10**3, 10**4, 10**5, 10**6, 10**7]),
+    'matrix_plot_build': (bench_matrix_plot_build, [(10, 10), (100, 100)], [(10, 10), (100, 100), (500, 500),
+                                                                             (2000, 2000)]),
+    'raster_matrix_plot_build': (bench_raster_matrix_plot_build, [(100, 100), (1000, 1000)], [(100, 100),
+                                                                                           (1000, 1000),
+                                                                                           (4000, 4000)]),
+    'template_render': (bench_template_render, [10**3, 10**4], [10**3, 10**4, 10**5, 10**6]),
+    'deep_document_build': (bench_deep_document_build, [100, 1000], [100, 1000, 10000, 100000]),
+    'wide_document_build': (bench_wide_document_build, [10, 100], [10, 100, 1000, 10000]),
+    'sections_document_build': (bench_sections_document_build, [100, 1000], [100, 1000, 10000]),
+    'walker_build': (bench_walker_build, [100, 1000], [100, 1000, 10000]),
+    'recursive_build': (bench_recursive_build, [100, 1000], [100, 1000, 10000]),
+}
+
+
+def measure(benchmark, size, workdir, repeat=1, memory=True):
+    """
+    Times the benchmark and measures its peak memory. The setup of the benchmark (creation of the objects) is excluded
+    from both measures.
+
+    Args:
+        benchmark (callable): Function receiving the size and a working directory which returns the function to measure.
+        size (int or tuple of ints): Size passed to the benchmark.
+        workdir (str): Directory where the files produced by the benchmark are written.
+        repeat (int): Number of timed runs. The fastest is reported.
+        memory (bool): If True, the peak memory is measured in an additional run.
+
+    Returns a dict with the time in seconds and the peak memory in bytes (None if not measured).
+    """
+    run = benchmark(size, workdir)
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        run()
+        times.append(perf_counter() - start)
+
+    peak_memory = None
+    if memory:
+        tracemalloc.start()
+        try:
+            run()
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {'time': min(times), 'peak_memory': peak_memory}
+
+
+def run_benchmarks(names, preset='quick', repeat=1, memory=True, verbose=True):
+    """
+    Runs the benchmarks and returns the results as a JSON serializable dict.
+
+    Args:
+        names (list of str): Names of the benchmarks to run (keys of BENCHMARKS).
+        preset (str, either 'quick' or 'full'): Sizes at which to run the benchmarks.
+        repeat (int): Number of timed runs per size.
+        memory (bool): Whether to measure the peak memory.
+        verbose (bool): If True, prints the results as they are obtained.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in names:
+            benchmark, quick_sizes, full_sizes = BENCHMARKS[name]
+            for size in quick_sizes if preset == 'quick' else full_sizes:
+                result = {'benchmark': name, 'size': size, **measure(benchmark, size, workdir, repeat, memory)}
+                results.append(result)
+                if verbose:
+                    print(format_result(result))
+
+    return {
+        'python2latex_version': version,
+        'python_version': platform.python_version(),
+        'numpy_version': np.__version__,
+        'platform': platform.platform(),
+        'preset': preset,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def _key(result):
+    size = result['size']
+    return result['benchmark'], tuple(size) if isinstance(size, list) else size
+
+
+def format_result(result, baseline=None):
+    size = 'x'.join(str(s) for s in result['size']) if isinstance(result['size'], (list, tuple)) else result['size']
+    line = f"{result['benchmark']:<26} {str(size):>12} {result['time']:>12.4f} s"
+    if result['peak_memory'] is not None:
+        line += f" {result['peak_memory'] / 2**20:>12.2f} MiB"
+    if baseline is not None:
+        line += f" {result['time'] / baseline['time']:>8.2f}x time"
+        if result['peak_memory'] is not None and baseline['peak_memory']:
+            line += f" {result['peak_memory'] / baseline['peak_memory']:>8.2f}x memory"
+    return line
+
+
+def compare(results, baseline):
+    """
+    Returns a report of the ratios of the results over the baseline, for every benchmark and size present in both.
+    """
+    baseline_results = {_key(result): result for result in baseline['results']}
+    lines = []
+    for result in results['results']:
+        if _key(result) in baseline_results:
+            lines.append(format_result(result, baseline_results[_key(result)]))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks of the building of python2latex objects.')
+    parser.add_argument('--benchmarks', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS),
+                        help='Benchmarks to run. All by default.')
+    parser.add_argument('--preset', choices=['quick', 'full'], default='quick', help='Sizes at which to run.')
+    parser.add_argument('--repeat', type=int, default=1, help='Number of timed runs per size. The fastest is kept.')
+    parser.add_argument('--no-memory', action='store_true', help='Do not measure the peak memory.')
+    parser.add_argument('--output', help='JSON file where to write the results.')
+    parser.add_argument('--compare', help='JSON file of previous results to compare with.')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.benchmarks, args.preset, args.repeat, not args.no_memory)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf8') as file:
+            json.dump(results, file, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf8') as file:
+            baseline = json.load(file)
+        print('\nComparison with', args.compare)
+        print(compare(results, baseline))
+
+
+if __name__ == '__main__':
+    main()
@@ -9,3 +9,7 @@ from .floating_environment import FloatingFigure, FloatingTable, FloatingEnviron
 from .plot import Plot, LinePlot, MatrixPlot
 from .template import Template
 from .table import Table
+from .profiler import BuildProfiler
+from .build_directory import BuildDirectory
+from .compilation import compile_many, CompilationResult
+from .latex_log import LatexLog, LatexError, parse_log
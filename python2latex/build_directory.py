@@ -0,0 +1,58 @@
+import os
+import shutil
+import hashlib
+import tempfile
+from contextlib import contextmanager
+
+from python2latex.utils import write_if_changed
+
+
+class BuildDirectory:
+    """
+    Scratch directories where tex files are compiled, so that the auxiliary files (.aux, .log, etc.) of concurrent
+    compilations never collide and the directory of the tex file only receives the pdf.
+
+    Usage example:
+    >>> from python2latex import Document, BuildDirectory
+    >>> doc = Document('Title', build_directory=BuildDirectory('/dev/shm', keep_aux_files=True))
+    >>> doc.build()
+    """
+    def __init__(self, root=None, keep_aux_files=False):
+        """
+        Args:
+            root (str or None): Directory in which the scratch directories are created, for example '/dev/shm' to
+            compile on a tmpfs. If None, the temporary directory of the system is used.
+            keep_aux_files (bool): If True, each tex file is always compiled in the same scratch directory, which is
+            kept, so that the auxiliary files of the last compilation are reused by the next one (for example, the
+            .aux file makes cross-references right in a single pass). If False, a new scratch directory is created for
+            each compilation and deleted afterward.
+        """
+        self.root = root
+        self.keep_aux_files = keep_aux_files
+
+    @contextmanager
+    def scratch_directory(self, tex_file):
+        """
+        Context manager giving the absolute path of the scratch directory where to compile 'tex_file'.
+        """
+        root = self.root or tempfile.gettempdir()
+        os.makedirs(root, exist_ok=True)
+        if self.keep_aux_files:
+            key = hashlib.sha256(os.path.abspath(tex_file.path).encode('utf8')).hexdigest()[:16]
+            path = os.path.abspath(os.path.join(root, f'python2latex-{key}'))
+            os.makedirs(path, exist_ok=True)
+            yield path
+        else:
+            path = os.path.abspath(tempfile.mkdtemp(prefix='python2latex-', dir=root))
+            try:
+                yield path
+            finally:
+                shutil.rmtree(path, ignore_errors=True)
+
+    @staticmethod
+    def copy_back(source, destination):
+        """
+        Copies a file out of a scratch directory. The destination is replaced atomically and only if it changed.
+        """
+        with open(source, 'rb') as source_file, write_if_changed(destination, 'wb') as destination_file:
+            shutil.copyfileobj(source_file, destination_file)
@@ -2,6 +2,8 @@ from python2latex import TexObject, TexCommand
 
 
 class DefineColor(TexCommand):
+    __slots__ = ()
+
     def __init__(self, color_name, *rgb):
         super().__init__('definecolor', color_name, 'rgb', ','.join([str(c) for c in rgb]))
 
@@ -0,0 +1,89 @@
+from concurrent.futures import ThreadPoolExecutor
+from subprocess import CalledProcessError
+from time import perf_counter
+
+from python2latex import TexFile
+
+
+class CompilationResult:
+    """
+    Result of the compilation of one document by 'compile_many'.
+    """
+    def __init__(self, document, compiled, time, error=None, log=None):
+        """
+        Args:
+            document (Union[Document, Template, TexFile]): The document compiled.
+            compiled (bool): Whether pdflatex was called. It is False if the compilation failed or was skipped because
+            nothing changed.
+            time (float): Wall time of the compilation in seconds.
+            error (Exception or None): Error raised by the compilation if it failed, for example a LatexError.
+            log (LatexLog or None): Parsed log of the compilation, None if pdflatex was not run.
+        """
+        self.document = document
+        self.compiled = compiled
+        self.time = time
+        self.error = error
+        self.log = log
+
+    @property
+    def success(self):
+        return self.error is None
+
+    def __repr__(self):
+        status = 'success' if self.success else f'failure ({self.error!r})'
+        return f'CompilationResult {self.document!r}: {status} in {self.time:.3f}s'
+
+
+def _tex_file(document):
+    if isinstance(document, TexFile):
+        return document
+    return getattr(document, 'output_file', None) or document.file
+
+
+def _compile(document, skip_unchanged, format_cache, max_passes):
+    tex_file = _tex_file(document)
+    data_files = document.collect_data_files() if hasattr(document, 'collect_data_files') else ()
+    start = perf_counter()
+    try:
+        compiled = tex_file.compile_to_pdf(skip_unchanged, data_files, format_cache, max_passes)
+    except (CalledProcessError, OSError) as error:
+        return CompilationResult(document, False, perf_counter() - start, error, getattr(error, 'log', None))
+    return CompilationResult(document, compiled, perf_counter() - start, log=tex_file.log if compiled else None)
+
+
+def compile_many(documents, workers=4, build=True, skip_unchanged=False, format_cache=None, max_passes=1):
+    """
+    Compiles many documents to pdf, with at most 'workers' pdflatex processes running at the same time. A failed
+    compilation does not stop the others: the success or failure and the time of every compilation are returned.
+
+    Usage example:
+    >>> from python2latex import Document, compile_many
+    >>> documents = [Document(f'figure{i}', doc_type='standalone') for i in range(1000)]
+    >>> results = compile_many(documents, workers=8)
+    >>> failures = [result for result in results if not result.success]
+
+    Args:
+        documents (Iterable[Union[Document, Template, TexFile]]): Documents to compile.
+        workers (int): Maximum number of compilations running concurrently. Since each compilation runs in its own
+        pdflatex process, the pool only waits on the processes.
+        build (bool): If True, Documents are first built and saved to disk, and Templates are rendered, in the main
+        process. If False, the tex files must already be saved.
+        skip_unchanged (bool): If True, the documents for which the tex and csv files did not change since their last
+        compilation are not compiled again. See TexFile.compile_to_pdf.
+        format_cache (str or None): Directory where to cache the precompiled preambles. Documents sharing the same
+        preamble, like many 'standalone' figures, then only parse it once. See TexFile.compile_to_pdf.
+        max_passes (int): Maximum number of pdflatex passes per document. See TexFile.compile_to_pdf.
+
+    Returns a list of CompilationResult in the same order as the documents.
+    """
+    documents = list(documents)
+    if build:
+        for document in documents:
+            if hasattr(document, 'render'):
+                document.render(compile_to_pdf=False, show_pdf=False)
+            elif not isinstance(document, TexFile):
+                document.build(save_to_disk=True, compile_to_pdf=False, show_pdf=False)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        compile_document = lambda document: _compile(document, skip_unchanged, format_cache, max_passes)
+        return list(executor.map(compile_document, documents))
@@ -0,0 +1,91 @@
+"""
+Reduction of the number of points of line plots while preserving their visual shape, so that very long series can be
+plotted by pgfplots. Each function returns the sorted indices of the points to keep, which always include the first
+and the last points.
+"""
+import numpy as np
+
+
+def decimate_minmax(X, Y, max_points):
+    """
+    Splits the series into buckets of consecutive points and keeps the points with the minimum and maximum Y of each
+    bucket. With about one bucket per pixel of the width of the figure, the rendered curve is identical to the curve of
+    all the points, including its peaks.
+
+    Args:
+        X (1D array): X coordinates. Unused, but kept for a common signature with decimate_lttb.
+        Y (1D array): Y coordinates.
+        max_points (int): Maximum number of points to keep.
+
+    Returns an array of indices.
+    """
+    n = len(Y)
+    if n <= max_points:
+        return np.arange(n)
+
+    n_buckets = max((max_points - 2) // 2, 1)
+    bucket_size = -(-(n - 2) // n_buckets)
+    n_full_buckets = (n - 2) // bucket_size
+    # Reshaping a slice of the inner points is a view, so that memory-mapped data is read but never copied.
+    buckets = np.asarray(Y[1:1 + n_full_buckets * bucket_size]).reshape(n_full_buckets, bucket_size)
+    offsets = 1 + bucket_size * np.arange(n_full_buckets)
+    indices = [[0], offsets + buckets.argmin(axis=1), offsets + buckets.argmax(axis=1), [n - 1]]
+
+    last_bucket = np.asarray(Y[1 + n_full_buckets * bucket_size:n - 1])
+    if len(last_bucket):
+        offset = 1 + n_full_buckets * bucket_size
+        indices.append([offset + last_bucket.argmin(), offset + last_bucket.argmax()])
+    return np.unique(np.concatenate(indices))
+
+
+def decimate_lttb(X, Y, max_points):
+    """
+    Largest-Triangle-Three-Buckets algorithm (Steinarsson, 2013). The inner points are split into max_points - 2
+    buckets and the point of each bucket kept is the one forming the largest triangle with the point kept in the
+    previous bucket and the average point of the next bucket. The areas of all the points of a bucket are computed at
+    once with numpy.
+
+    Args:
+        X (1D array): X coordinates. If not numeric, the indices of the points are used instead.
+        Y (1D array): Y coordinates.
+        max_points (int): Maximum number of points to keep.
+
+    Returns an array of indices.
+    """
+    n = len(Y)
+    if n <= max_points or max_points < 3:
+        return np.arange(n) if n <= max_points else np.array([0, n - 1])
+
+    # Coordinates are converted to float bucket by bucket, so that memory-mapped data is never copied in full.
+    X = np.asarray(X) if np.asarray(X).dtype.kind in 'iuf' else np.arange(n)
+    Y = np.asarray(Y)
+
+    n_buckets = max_points - 2
+    edges = 1 + np.floor(np.arange(n_buckets + 1) * (n - 2) / n_buckets).astype(int)
+    counts = np.diff(edges)
+    next_x = np.append(np.add.reduceat(X[1:-1], edges[:-1] - 1, dtype=float) / counts, X[-1])[1:]
+    next_y = np.append(np.add.reduceat(Y[1:-1], edges[:-1] - 1, dtype=float) / counts, Y[-1])[1:]
+
+    indices = np.empty(max_points, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    previous = 0
+    for i in range(n_buckets):
+        x = X[edges[i]:edges[i + 1]].astype(float)
+        y = Y[edges[i]:edges[i + 1]].astype(float)
+        previous_x, previous_y = float(X[previous]), float(Y[previous])
+        areas = np.abs((previous_x - next_x[i]) * (y - previous_y) - (previous_x - x) * (next_y[i] - previous_y))
+        previous = edges[i] + int(np.argmax(areas))
+        indices[i + 1] = previous
+    return indices
+
+
+decimation_methods = {
+    'minmax': decimate_minmax,
+    'lttb': decimate_lttb,
+}
+
+# Smallest 'max_points' each method can satisfy: minmax keeps the first and last points and both extrema of a bucket.
+min_points = {
+    'minmax': 4,
+    'lttb': 3,
+}
@@ -1,5 +1,18 @@
+import os
+import pickle
+import shutil
+import asyncio
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextvars import copy_context
+from contextlib import contextmanager
+from functools import partial
+
 from python2latex import TexFile, TexEnvironment, TexCommand, build
-from python2latex.utils import open_file_with_default_program
+from python2latex.tex_base import write_parts, _Requirements, _building_file
+from python2latex.tex_environment import _is_streamable
+from python2latex.profiler import BuildProfiler
+from python2latex.utils import open_file_with_default_program, write_if_changed
 
 
 class Document(TexEnvironment):
@@ -8,13 +21,26 @@ class Document(TexEnvironment):
     Has a body, a preamble and a dict of packages updated recursively with other TexEnvironment nested inside the body.
     The 'build' method writes all text to a .tex file and compiles it to pdf.
     """
-    def __init__(self, filename, filepath='.', doc_type='article', options=(), **kwoptions):
+    def __init__(self,
+                 filename,
+                 filepath='.',
+                 doc_type='article',
+                 options=(),
+                 engine='pdflatex',
+                 fallback_engine=None,
+                 build_directory=None,
+                 **kwoptions):
         r"""
         Args:
             filename (str): Name of the file without extension.
             filepath (str): Path where the files will be saved and compiled to pdf.
             doc_type (str): Any document type LaTeX supports, like 'article', 'standalone', etc.
             options (Union[Tuple[str], str, TexObject]): Any options that goes between brackets. See template further.
+            engine (str): TeX engine used to compile the document, like 'pdflatex', 'lualatex' or 'xelatex'.
+            fallback_engine (str or None): Engine with which to retry the compilation if 'engine' runs out of memory,
+            like 'lualatex' which allocates its memory dynamically. See TexFile.
+            build_directory (BuildDirectory or None): If not None, the document is compiled in a scratch directory and
+            only the pdf is copied to 'filepath', which makes concurrent compilations in the same directory safe.
             kwoptions (keyword options of the document type): Options should be strings. The dict is converted to string
             when building to tex. See template below.
 
@@ -24,7 +50,7 @@ class Document(TexEnvironment):
         super().__init__('document')
         self.filename = filename
         self.filepath = filepath
-        self.file = TexFile(filename, filepath)
+        self.file = TexFile(filename, filepath, engine, fallback_engine, build_directory)
 
         self.doc_class = TexCommand('documentclass',
                                     doc_type,
@@ -35,6 +61,8 @@ class Document(TexEnvironment):
         self.add_package('inputenc', 'utf8')
         self.set_margins('2.5cm')
 
+        self.build_profile = None
+
     def __repr__(self):
         return f'Document {self.filename}'
 
@@ -64,7 +92,16 @@ class Document(TexEnvironment):
         """
         return self.new(Section(name, label=label))
 
-    def build(self, save_to_disk=True, compile_to_pdf=True, show_pdf=True):
+    def build(self,
+              save_to_disk=True,
+              compile_to_pdf=True,
+              show_pdf=True,
+              incremental=False,
+              profile=False,
+              workers=None,
+              skip_unchanged=False,
+              format_cache=None,
+              max_passes=1):
         """
         Builds the document to a tex file and optionally compiles it into tex and show the output pdf in the default
         pdf reader of the system.
@@ -75,25 +112,207 @@ class Document(TexEnvironment):
             compile_to_pdf (bool): If True, automatically call pdflatex to compile the generated tex file to pdf.
             show_pdf (bool): If True, the default pdf reader will be called to show the compiled pdf. This may not work
             well with non-read-only pdf viewer such as Acrobat Reader or Foxit Reader.
+            incremental (bool): If True, only the parts of the document modified since the last incremental build are
+            rebuilt, the rest is reused from cache. Objects modified in place must then be invalidated manually (see
+            TexObject.invalidate).
+            profile (bool): If True, the build is profiled and the BuildProfiler is stored in the 'build_profile'
+            attribute of the document. Use 'self.build_profile.report()' or 'self.build_profile.to_json()' to see the
+            results.
+            workers (int or None): If greater than 1, the top-level environments of the document (usually sections)
+            are built concurrently in this number of worker processes, including the saving of the data of their
+            plots to csv. The result is identical to the serial build. Environments which cannot be pickled, like
+            instances of binded classes, are built in the main process. Ignored for incremental and profiled builds.
+            On platforms which spawn processes, the calling script should be protected by 'if __name__ == "__main__"'.
+            skip_unchanged (bool): If True, the compilation to pdf is skipped when the tex file and the csv files of the
+            plots are identical to those of the last compilation. See TexFile.compile_to_pdf.
+            format_cache (str or None): Directory where to cache the precompiled preamble, which speeds up the
+            compilation of documents sharing the same preamble. See TexFile.compile_to_pdf.
+            max_passes (int): Maximum number of pdflatex passes. Passes after the first are only run when needed to
+            get cross-references right. See TexFile.compile_to_pdf.
 
         Returns:
             The tex string of the file.
         """
-        tex = super().build()
+        if profile:
+            self.build_profile = BuildProfiler()
+            with self.build_profile:
+                return self.build(save_to_disk, compile_to_pdf, show_pdf, incremental, workers=workers,
+                                  skip_unchanged=skip_unchanged, format_cache=format_cache, max_passes=max_passes)
 
-        tex = build(self.doc_class) + '\n' + self.build_preamble() + '\n' + tex
+        tex, data_files = self._build_tex(incremental, workers)
         if save_to_disk:
             self.file.save(tex)
 
         if compile_to_pdf:
             self.file.save(tex)
-            self.file.compile_to_pdf()
+            self.file.compile_to_pdf(skip_unchanged, data_files, format_cache, max_passes)
 
         if show_pdf:
             open_file_with_default_program(self.filename, self.filepath)
 
         return tex
 
+    async def build_async(self,
+                          save_to_disk=True,
+                          compile_to_pdf=True,
+                          show_pdf=True,
+                          incremental=False,
+                          skip_unchanged=False,
+                          format_cache=None,
+                          max_passes=1):
+        """
+        Asynchronous version of 'build' for asyncio applications. The tex is built and written to disk, with the csv
+        files of the plots, in the default executor of the event loop, and pdflatex is run in an asyncio subprocess, so
+        that the event loop is never blocked.
+
+        Usage example:
+        >>> tex = await doc.build_async(show_pdf=False)
+
+        Args:
+            See 'build'.
+
+        Returns:
+            The tex string of the file.
+        """
+        loop = asyncio.get_running_loop()
+        tex, data_files = await loop.run_in_executor(None, partial(copy_context().run, self._build_tex, incremental))
+        if save_to_disk or compile_to_pdf:
+            await loop.run_in_executor(None, self.file.save, tex)
+
+        if compile_to_pdf:
+            await self.file.compile_to_pdf_async(skip_unchanged, data_files, format_cache, max_passes)
+
+        if show_pdf:
+            await loop.run_in_executor(None, open_file_with_default_program, self.filename, self.filepath)
+
+        return tex
+
+    def _build_tex(self, incremental=False, workers=None):
+        """
+        Builds the tex of the document. The packages, the preamble lines and the data files are collected while building
+        the body, in the same pass.
+
+        Returns the tex string and the list of the paths of the data files.
+        """
+        requirements = _Requirements()
+        with self._building(requirements):
+            if workers is not None and workers > 1 and not incremental and BuildProfiler.current() is None:
+                body = self._build_parallel(workers, requirements)
+            else:
+                body = super().build(incremental)
+
+        tex = build(self.doc_class) + '\n' + requirements.build_preamble() + '\n' + body
+        return tex, list(requirements.data_files)
+
+    @contextmanager
+    def _building(self, requirements):
+        """
+        Collects in 'requirements' the requirements of the objects built in the 'with' block and makes the file of the
+        document the one whose settings are used to compile the externalized figures.
+        """
+        token = _building_file.set(self.file)
+        try:
+            with requirements.collecting():
+                yield
+        finally:
+            _building_file.reset(token)
+
+    def _build_parallel(self, workers, requirements):
+        """
+        Builds the top-level environments in a pool of 'workers' processes and stitches their parts in order. The
+        objects are pickled with their id numbers, which are allocated when they are created, so the ids in the tex
+        are the same as in a serial build. The global counters of plots and colors are also sent to the workers so that
+        any id allocated there follows the ids already allocated in the main process.
+
+        The requirements collected by the workers are added to 'requirements' in the order of the parts.
+
+        Returns the tex string of the body of the document.
+        """
+        from python2latex.plot import _Plot
+        from python2latex.color import Color
+
+        parts = self._build_parts()
+        requirements.add(self)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {}
+            for i, part in enumerate(parts):
+                if isinstance(part, TexEnvironment):
+                    try:
+                        pickled_part = pickle.dumps(part)
+                    except (pickle.PicklingError, AttributeError, TypeError):
+                        continue  # Built in the main process
+                    futures[i] = executor.submit(_build_in_worker, pickled_part, _Plot.plot_count, Color.color_count,
+                                                 self.file)
+
+            tex = []
+            for i, part in enumerate(parts):
+                if i in futures:
+                    part_tex, part_requirements = futures[i].result()
+                    tex.extend(part_tex)
+                    requirements.update(part_requirements)
+                else:
+                    tex.extend(_iter_build_part(part))
+
+        return '\n'.join(tex)
+
+    def write_to(self, stream=None, incremental=False):
+        """
+        Builds the document and writes the tex directly to a file-like object, part by part, instead of returning one
+        big string. The memory used depends on the depth of the document tree, not on the size of the output. Use
+        this method instead of 'build' for very large documents, then call 'self.file.compile_to_pdf()' if needed.
+
+        Since the packages and the preamble lines are collected while building, the body is written to a temporary file
+        first and copied to the stream after the preamble.
+
+        Args:
+            stream (file-like object or None): Text stream to write to. If None, the tex is written to the file of the
+            document (see the 'filename' and 'filepath' arguments).
+            incremental (bool): See 'build'.
+        """
+        if stream is None:
+            os.makedirs(self.filepath, exist_ok=True)
+            with write_if_changed(self.file.path, encoding='utf8') as file:
+                self.write_to(file, incremental)
+            return
+
+        requirements = _Requirements()
+        with tempfile.TemporaryFile('w+', encoding='utf8') as body:
+            with self._building(requirements):
+                write_parts(body, self.iter_build(incremental))
+            stream.write(build(self.doc_class) + '\n' + requirements.build_preamble() + '\n')
+            body.seek(0)
+            shutil.copyfileobj(body, stream)
+
+
+def _iter_build_part(part):
+    """
+    Yields the non-empty parts of tex of a part of an environment, as 'TexEnvironment.iter_build' would.
+    """
+    if _is_streamable(part):
+        yield from part.iter_build()
+    else:
+        tex = build(part)
+        if tex:
+            yield tex
+
+
+def _build_in_worker(pickled_part, plot_count, color_count, tex_file):
+    """
+    Builds a pickled part of a document in a worker process and returns the list of its parts of tex and the
+    requirements collected while building it. 'tex_file' is the file of the document, whose settings are used to
+    compile the externalized figures.
+    """
+    from python2latex.plot import _Plot
+    from python2latex.color import Color
+
+    _Plot.plot_count = max(_Plot.plot_count, plot_count)
+    Color.color_count = max(Color.color_count, color_count)
+    _building_file.set(tex_file)
+    requirements = _Requirements()
+    with requirements.collecting():
+        parts = list(_iter_build_part(pickle.loads(pickled_part)))
+    return parts, requirements
+
 
 class Section(TexEnvironment):
     """
@@ -7,6 +7,8 @@ class Caption(TexCommand):
     """
     Simple caption command.
     """
+    __slots__ = ()
+
     def __init__(self, caption):
         """
         Args:
@@ -49,25 +51,25 @@ class _FloatingEnvironment(TexEnvironment):
         self.caption_space = caption_space
         self.centered = centered
 
-    def build(self):
+    def _build_body(self):
         """
-        Builds recursively the environments of the body and converts it to .tex.
-        Returns the .tex string of the file.
+        Adds the caption, the label and the centering command around the body.
         """
+        body = super()._build_body()
         if self.caption:
             caption = Caption(self.caption)
             space = TexCommand('vspace', self.caption_space) if self.caption_space else ''
 
             if self.caption_pos == 'top':
-                self.body = [caption, self._label, space] + self.body
+                body = [caption, self._label, space] + body
 
             if self.caption_pos == 'bottom':
-                self.body += [space, caption, self._label]
+                body = body + [space, caption, self._label]
 
         if self.centered:
-            self.body = [r'\centering'] + self.body
+            body = [r'\centering'] + body
 
-        return super().build()
+        return body
 
 
 class FloatingFigure(_FloatingEnvironment):
@@ -94,7 +96,7 @@ class FloatingTable(_FloatingEnvironment):
         super().__init__('table', *args, caption_pos=caption_pos, caption_space=caption_space, **kwargs)
 
 
-class FloatingEnvironmentMixin:
+class FloatingEnvironmentMixin(TexObject):
     """
     Makes an environment optionally floatable.
     Should be inherited and a 'super_class' parameter should be included. 'super_class' should be a FloatingEnvironment
@@ -106,6 +108,8 @@ class FloatingEnvironmentMixin:
 
     See the Table and the Plot environments for complete examples.
     """
+    __slots__ = ()  # Keeps the same memory layout as TexObject, so that 'super_class' can be added to the bases.
+
     def __init__(self, *args, as_float_env=True, centered=True, **kwargs):
         """
         Args:
@@ -115,16 +119,15 @@ class FloatingEnvironmentMixin:
         centered = False if not as_float_env else centered
         super().__init__(*args, centered=centered, **kwargs)
         self.as_float_env = as_float_env
-        if not as_float_env:
-            self.head = TexObject('')
-            self.tail = TexObject('')
-            self.options = ()
 
     def __init_subclass__(cls, super_class):
         cls.__bases__ += (super_class, )
 
-    def build(self):
+    def _build_parts(self):
         if not self.as_float_env and self.caption:
             self.caption = ''  # No caption outside of float env
             warnings.warn('Cannot produce caption outside floating environment!')
-        return super().build()
+        parts = super()._build_parts()
+        if not self.as_float_env:
+            parts = parts[1:-1]  # Removes the head and the tail of the floating environment.
+        return parts
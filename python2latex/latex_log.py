@@ -0,0 +1,156 @@
+import re
+from subprocess import CalledProcessError
+
+
+class LogMessage:
+    """
+    Error, warning or bad box reported in a LaTeX log.
+    """
+    __slots__ = ('message', 'line')
+
+    def __init__(self, message, line=None):
+        """
+        Args:
+            message (str): Message of the log.
+            line (int or None): Line of the tex file concerned by the message, if known.
+        """
+        self.message = message
+        self.line = line
+
+    def __eq__(self, other):
+        return isinstance(other, LogMessage) and (self.message, self.line) == (other.message, other.line)
+
+    def __repr__(self):
+        line = f' (line {self.line})' if self.line is not None else ''
+        return f'LogMessage {self.message!r}{line}'
+
+
+class LatexLog:
+    """
+    Parsed content of the .log file of a compilation, with its wall time.
+
+    Attributes:
+        errors (list of LogMessage): Errors ('! ...' lines) with the line of the tex file where they occurred.
+        warnings (list of LogMessage): LaTeX, package, class and pdfTeX warnings.
+        bad_boxes (list of LogMessage): Overfull and underfull boxes.
+        memory (dict): Statistics of the memory used by TeX, as {name: (used, limit)}, from the 'Here is how much of
+        TeX's memory you used' section. For example, memory['words of memory'] is (384658, 5000000). Limits with
+        multiple parts, like '15000+600000', are summed. Only available when the compilation ran to the end.
+        pages (int or None): Number of pages of the output, None if unknown.
+        time (float or None): Wall time of the compilation in seconds, including every pass.
+        passes (int): Number of passes of the engine.
+        engine (str or None): Engine which produced the log, like 'pdflatex' or 'lualatex'.
+    """
+    def __init__(self,
+                 errors=(),
+                 warnings=(),
+                 bad_boxes=(),
+                 memory=None,
+                 pages=None,
+                 time=None,
+                 passes=0,
+                 engine=None):
+        self.errors = list(errors)
+        self.warnings = list(warnings)
+        self.bad_boxes = list(bad_boxes)
+        self.memory = memory or {}
+        self.pages = pages
+        self.time = time
+        self.passes = passes
+        self.engine = engine
+
+    @property
+    def capacity_exceeded(self):
+        """
+        Whether TeX ran out of memory ('TeX capacity exceeded' error).
+        """
+        return any('TeX capacity exceeded' in error.message for error in self.errors)
+
+    def memory_usage(self):
+        """
+        Returns the ratio of used over available memory of every memory statistics, as {name: ratio}.
+        """
+        return {name: used / limit for name, (used, limit) in self.memory.items() if limit}
+
+    def __repr__(self):
+        return f'LatexLog: {len(self.errors)} errors, {len(self.warnings)} warnings, ' \
+               f'{len(self.bad_boxes)} bad boxes, {self.pages} pages'
+
+
+class LatexError(CalledProcessError):
+    """
+    Error raised when the TeX engine fails. The parsed log is available in the 'log' attribute.
+    """
+    def __init__(self, returncode, cmd, log=None):
+        super().__init__(returncode, cmd)
+        self.log = log or LatexLog()
+
+    def __str__(self):
+        message = super().__str__()
+        if self.log.errors:
+            message += ' ' + '; '.join(repr(error) for error in self.log.errors[:3])
+        return message
+
+
+_line_number_pattern = re.compile(r'^l\.(\d+)')
+_warning_pattern = re.compile(r'^((?:LaTeX|Package \S+|Class \S+|pdfTeX)(?: Font)? Warning: .*)')
+_input_line_pattern = re.compile(r'on input line (\d+)')
+_bad_box_pattern = re.compile(r'^((?:Overfull|Underfull) \\[hv]box .*)')
+_bad_box_line_pattern = re.compile(r'lines? (\d+)')
+_memory_pattern = re.compile(r'^\s*(\d+) (.+?) out of ([\d+]+)\s*$')
+_pages_pattern = re.compile(r'^Output written on .* \((\d+) pages?')
+
+
+def parse_log(text):
+    """
+    Parses the content of a LaTeX .log file.
+
+    Args:
+        text (str): Content of the log.
+
+    Returns a LatexLog.
+    """
+    log = LatexLog()
+    lines = text.splitlines()
+    in_memory_section = False
+    for i, line in enumerate(lines):
+        if line.startswith('! '):
+            error_line = None
+            for next_line in lines[i + 1:i + 20]:
+                match = _line_number_pattern.match(next_line)
+                if match:
+                    error_line = int(match.group(1))
+                    break
+            log.errors.append(LogMessage(line[2:].strip(), error_line))
+            continue
+
+        match = _warning_pattern.match(line)
+        if match:
+            input_line = _input_line_pattern.search(line)
+            log.warnings.append(LogMessage(match.group(1).strip(), int(input_line.group(1)) if input_line else None))
+            continue
+
+        match = _bad_box_pattern.match(line)
+        if match:
+            box_line = _bad_box_line_pattern.search(line)
+            log.bad_boxes.append(LogMessage(match.group(1).strip(), int(box_line.group(1)) if box_line else None))
+            continue
+
+        if line.startswith("Here is how much of TeX's memory you used"):
+            in_memory_section = True
+            continue
+        if in_memory_section:
+            match = _memory_pattern.match(line)
+            if match:
+                used, name, limit = match.groups()
+                log.memory[name] = (int(used), sum(int(part) for part in limit.split('+') if part))
+                continue
+            in_memory_section = line.startswith(' ')
+
+        match = _pages_pattern.match(line)
+        if match:
+            log.pages = int(match.group(1))
+        elif line.startswith('No pages of output'):
+            log.pages = 0
+
+    return log
@@ -1,10 +1,16 @@
 import os
+import hashlib
 from datetime import datetime as dt
-import itertools
-import csv
 import numpy as np
 
-from python2latex import FloatingFigure, FloatingEnvironmentMixin, TexEnvironment, TexCommand
+from python2latex import FloatingFigure, FloatingEnvironmentMixin, TexEnvironment, TexCommand, TexObject
+from python2latex.tex_environment import begin
+from python2latex.traversal import walk
+from python2latex.profiler import profile_operation
+from python2latex.utils import write_if_changed, hash_file
+from python2latex.tex_base import TexFile, _Requirements, _building_file
+from python2latex.decimation import decimation_methods, min_points
+from python2latex.raster import pgfplots_colormap, apply_colormap, write_png, finite_range
 
 
 class _AxisProperty:
@@ -17,18 +23,19 @@ class _AxisProperty:
 
     def __set__(self, obj, value):
         obj.axis.kwoptions[self.param_name] = value
+        obj.axis.invalidate()
 
 
 class _AxisTicksProperty(_AxisProperty):
     def __set__(self, obj, value):
         value = '{' + ','.join(f"{v:.3f}" for v in value) + '}'
-        obj.axis.kwoptions[self.param_name] = value
+        super().__set__(obj, value)
 
 
 class _AxisTicksLabelsProperty(_AxisProperty):
     def __set__(self, obj, value):
         value = '{' + ','.join(value) + '}'
-        obj.axis.kwoptions[self.param_name] = value
+        super().__set__(obj, value)
 
 
 class Plot(FloatingEnvironmentMixin, super_class=FloatingFigure):
@@ -68,6 +75,11 @@ class Plot(FloatingEnvironmentMixin, super_class=FloatingFigure):
                  caption='',
                  caption_pos='bottom',
                  caption_space='',
+                 externalize=None,
+                 float_format=None,
+                 non_finite=None,
+                 max_points=None,
+                 decimation='minmax',
                  **axis_kwoptions):
         """
         Args:
@@ -99,6 +111,32 @@ class Plot(FloatingEnvironmentMixin, super_class=FloatingFigure):
 
             caption, caption_pos, caption_space: See _FloatingEnvironment for description.
 
+            externalize (str or None): If not None, path of a directory used as a store of compiled figures. The
+            tikzpicture is then compiled alone when building, into a pdf named after the hash of its tex code and of its
+            data, which is included in the document instead of the tikzpicture. The pdf is reused until the plot or its
+            data change, so pgfplots does not have to typeset the plot at every compilation of the document. Inside a
+            Document, the figure is compiled with the engines and the build directory of the document. The compilation
+            is synchronous: it blocks the build until the engine returns, even in Document.build_async, where it blocks
+            the executor thread running the build.
+
+            float_format (str or None): Standard Python float format, like '.3f' (fixed decimals) or '.6g'
+            (significant digits), used to save the floats of the plots to the csv file. If None, floats are saved with
+            full precision. Formats with a thousands separator, like ',.2f', are rejected, since commas delimit the
+            columns of the csv file. Plots can override it with their own 'float_format'.
+            non_finite (str or None): What to do with NaN and infinite coordinates of the plots, which pgfplots cannot
+            plot. If 'drop', the points are removed from the csv file. If 'mask', they are saved as NaN and the curves
+            are interrupted at these points ('unbounded coords=jump'). If None, they are saved as is. Plots can override
+            it with their own 'non_finite'.
+            max_points (int or None): If not None, line plots with more points are decimated to at most this number of
+            points when saved to the csv file, which keeps very long series within what pgfplots can handle. A few
+            thousand points, about two per pixel of the width of the figure, are enough for the rendered curve to look
+            the same. Should be at least 4 with 'minmax' and 3 with 'lttb'. Plots can override it with their own
+            'max_points'.
+            decimation (str, either 'minmax' or 'lttb'): Decimation algorithm. 'minmax' keeps the minimum and the
+            maximum of buckets of consecutive points, which preserves every peak. 'lttb'
+            (Largest-Triangle-Three-Buckets) keeps the most visually significant point of each bucket. See
+            python2latex.decimation.
+
             axis_kwoptions (dict): pgfplots keyword options for the axis. All underscore will be replaced by spaces
             when converted to LaTeX parameters.
         """
@@ -113,8 +151,22 @@ class Plot(FloatingEnvironmentMixin, super_class=FloatingFigure):
         self.add_package('pgfplots')
         self.add_package('pgfplotstable')
 
+        self.externalize = externalize
+        if externalize is not None:
+            self.add_package('graphicx')
+
+        self.float_format = _check_float_format(float_format)
+        self.non_finite = _check_non_finite(non_finite)
+        self.decimation = _check_decimation(decimation)
+        self.max_points = _check_max_points(max_points, self.decimation)
+        if non_finite is not None:
+            # Also interrupts matrix plots, which are always masked, at their non-finite values.
+            axis_kwoptions['unbounded coords'] = 'jump'
+
         self.tikzpicture = TexEnvironment('tikzpicture')
         self.add_text(self.tikzpicture)
+        self.table_read = _TableRead()
+        self.tikzpicture.add_text(self.table_read)
 
         if grid is True:
             grid = 'major'
@@ -127,12 +179,12 @@ class Plot(FloatingEnvironmentMixin, super_class=FloatingFigure):
             f'axis x line*={axis_x}',
             # 'axis line style={-latex}',
         )
-        self.axis = TexEnvironment('axis',
-                                   options=options,
-                                   width=width,
-                                   height=height,
-                                   grid=grid,
-                                   **axis_kwoptions)
+        self.axis = _Axis(self,
+                          options=options,
+                          width=width,
+                          height=height,
+                          grid=grid,
+                          **axis_kwoptions)
         self.tikzpicture.add_text(self.axis)
         # if not marks:
         #     self.axis.options += ['no marks',]
@@ -164,7 +216,8 @@ class Plot(FloatingEnvironmentMixin, super_class=FloatingFigure):
         for x, y in zip(iter_X_Y, iter_X_Y):
             self.add_plot(x, y)
         if len(X_Y) % 2 != 0:  # Copies matplotlib.pyplot.plot() behavior
-            self.add_plot(np.arange(len(X_Y[-1])), X_Y[-1])
+            Y = _as_array(X_Y[-1])
+            self.add_plot(np.arange(len(Y)), Y)
 
         self.matrix_plot = None
 
@@ -182,7 +235,17 @@ class Plot(FloatingEnvironmentMixin, super_class=FloatingFigure):
 
     legend_position = _AxisProperty('legend pos')
 
-    def add_plot(self, X, Y, *options, legend=None, forget_plot=True, **kwoptions):
+    def add_plot(self,
+                 X,
+                 Y,
+                 *options,
+                 legend=None,
+                 forget_plot=True,
+                 float_format=None,
+                 non_finite=None,
+                 max_points=None,
+                 decimation=None,
+                 **kwoptions):
         """
         Adds a plot to the axis.
 
@@ -192,11 +255,33 @@ class Plot(FloatingEnvironmentMixin, super_class=FloatingFigure):
             options (Tuple[Union(str, TexObject]): Options for the plot. Colors can be specified here as strings of the whole color, e.g. 'black', 'red', 'blue', etc. See pgfplots '\addplot[options]' for possible options. All underscores are replaced by spaces when converted to LaTeX.
             legend (str): Entry of the plot.
             forget_plot (bool): forget_plot is used to correctly present the legend. Default behavior is to add 'forget plot' option when no legend is provided. However, this can lead to incompatibility when plotting histograms. It is advised to set it to False in that case.
+            float_format (str or None): Float format of the coordinates in the csv file. If None, the 'float_format' of the Plot is used.
+            non_finite (str or None): Either 'drop' or 'mask'. See the Plot. If None, the 'non_finite' of the Plot is used.
+            max_points (int or None): Maximum number of points saved to the csv file. If None, the 'max_points' of the Plot is used.
+            decimation (str or None): Either 'minmax' or 'lttb'. See the Plot. If None, the 'decimation' of the Plot is used.
             kwoptions (Dict[str, Union(str, TexObject)): Keyword options for the plot. See pgfplots '\addplot[kwoptions]' for possible options. All underscores are replaced by spaces when converted to LaTeX.
         """
-        self.axis += LinePlot(X, Y, *options, legend=legend, forget_plot=forget_plot, **kwoptions)
-
-    def add_matrix_plot(self, X, Y, Z, *options, colorbar=True, **kwoptions):
+        self.axis += LinePlot(X,
+                              Y,
+                              *options,
+                              legend=legend,
+                              forget_plot=forget_plot,
+                              float_format=float_format,
+                              non_finite=non_finite,
+                              max_points=max_points,
+                              decimation=decimation,
+                              **kwoptions)
+
+    def add_matrix_plot(self,
+                        X,
+                        Y,
+                        Z,
+                        *options,
+                        colorbar=True,
+                        float_format=None,
+                        non_finite=None,
+                        raster=False,
+                        **kwoptions):
         """
         Adds a matrix plot to the axis.
 
@@ -207,15 +292,39 @@ class Plot(FloatingEnvironmentMixin, super_class=FloatingFigure):
             options (Union[Tuple[str], str, TexObject]): Options for the plot. See pgfplots '\addplot[options]' for
             possible options. All underscores are replaced by spaces when converted to LaTeX.
             colorbar (str): Colorbar legend.
+            float_format (str or None): Float format of the coordinates in the csv file. If None, the 'float_format' of
+            the Plot is used.
+            non_finite (str or None): Only 'mask' is supported, since dropping points would break the mesh. If None, the
+            'non_finite' of the Plot is used.
+            raster (bool): If True, Z is saved as a PNG image colored with the 'viridis' colormap, named after the plot,
+            instead of a csv file, and is included with '\addplot graphics'. The colorbar uses the same colormap and
+            range. This is much faster to compile for large matrices, which pgfplots would otherwise typeset point by
+            point. X and Y should be equally spaced. Non-finite values are transparent.
             kwoptions (tuple of str): Keyword options for the plot. See pgfplots '\addplot[kwoptions]' for possible
             options. All underscores are replaced by spaces when converted to LaTeX.
         """
         if colorbar:
             self.axis.options += ('colorbar', )
             # self.axis.kwoptions['enlargelimits'] = 'false'
-        self.axis += MatrixPlot(X, Y, Z, *options, **kwoptions)
+        matrix_plot = MatrixPlot(X,
+                                 Y,
+                                 Z,
+                                 *options,
+                                 float_format=float_format,
+                                 non_finite=non_finite,
+                                 raster=raster,
+                                 **kwoptions)
+        if raster:
+            self.axis.options += ('enlargelimits=false', 'axis on top')
+            self.axis.kwoptions['colormap'] = pgfplots_colormap('python2latex')
+            self.axis.kwoptions['point meta min'], self.axis.kwoptions['point meta max'] = map(str, matrix_plot.z_range)
+        self.axis += matrix_plot
 
     def save_to_csv(self):
+        """
+        Saves the data of the plots to the csv file 'plot_path/plot_name.csv'. The file is not rewritten if its content
+        is unchanged (see utils.write_if_changed).
+        """
         filepath = os.path.join(self.plot_path, self.plot_name + '.csv')
         os.makedirs(self.plot_path, exist_ok=True)
         plots = [obj for obj in self.axis.body if isinstance(obj, _Plot)]
@@ -223,41 +332,323 @@ class Plot(FloatingEnvironmentMixin, super_class=FloatingFigure):
         for i, plot in enumerate(plots):
             if isinstance(plot, MatrixPlot):
                 matrix_plot = plots.pop(i)
-
-        with open(filepath, 'w', newline='') as file:
-            writer = csv.writer(file)
-
-            titles = [coor for p in plots for coor in (f'x{p.id_number}', f'y{p.id_number}')]
-            if matrix_plot:
-                titles += [
-                    f'x{matrix_plot.id_number}',
-                    f'y{matrix_plot.id_number}',
-                    f'z{matrix_plot.id_number}'
-                ]
-            writer.writerow(titles)
-            data = [x_y for p in plots for x_y in (p.X, p.Y)]
-            if matrix_plot:
-                XX, YY = np.meshgrid(matrix_plot.X, matrix_plot.Y)
-                data += [XX.reshape(-1), YY.reshape(-1), matrix_plot.Z.T.reshape(-1)]
-
-            for row in itertools.zip_longest(*data, fillvalue=''):
-                writer.writerow(row)
-
-    def build(self):
+        if matrix_plot and matrix_plot.raster:
+            matrix_plot = None  # Saved by save_to_png
+
+        titles, data, float_formats = [], [], []
+        for p in plots:
+            titles += [f'x{p.id_number}', f'y{p.id_number}']
+            X, Y = _clean_non_finite([p.X, p.Y], p.non_finite or self.non_finite)
+            data += _decimate(X, Y, p.max_points or self.max_points, p.decimation or self.decimation)
+            float_formats += [p.float_format or self.float_format] * 2
+        if matrix_plot:
+            titles += [f'x{matrix_plot.id_number}', f'y{matrix_plot.id_number}', f'z{matrix_plot.id_number}']
+            # Points cannot be dropped from a mesh, so they are always masked.
+            mask = (matrix_plot.non_finite or self.non_finite) is not None
+            data += [_GridColumn(matrix_plot, axis, mask) for axis in range(3)]
+            float_formats += [matrix_plot.float_format or self.float_format] * 3
+
+        with profile_operation('Plot.save_to_csv', self.plot_name), write_if_changed(filepath, newline='') as file:
+            _write_csv_columns(file, titles, data, float_formats)
+
+    def save_to_png(self):
+        """
+        Saves the matrix plot in raster mode, if any, to the image 'plot_path/plot_name.png'. The file is not rewritten
+        if its content is unchanged (see utils.write_if_changed).
+        """
+        for obj in self.axis.body:
+            if isinstance(obj, MatrixPlot) and obj.raster:
+                os.makedirs(self.plot_path, exist_ok=True)
+                filepath = os.path.join(self.plot_path, self.plot_name + '.png')
+                with profile_operation('Plot.save_to_png', self.plot_name), write_if_changed(filepath, 'wb') as file:
+                    obj.write_png(file)
+
+    def _data_files(self):
+        data_files = [os.path.join(self.plot_path, self.plot_name + '.csv')]
+        if any(isinstance(obj, MatrixPlot) and obj.raster for obj in self.axis.body):
+            data_files.append(os.path.join(self.plot_path, self.plot_name + '.png'))
+        return data_files
+
+    def _build_parts(self):
+        # We cannot use os.path.join, since on Windows it uses backslashes,
+        # but pgfplots can only read paths with forward slashes.
+        plot_filepath = (self.plot_path + '/' + self.plot_name + '.csv').replace('//', '/')
+        csv_plots = [obj for obj in self.axis.body
+                     if isinstance(obj, _Plot) and not (isinstance(obj, MatrixPlot) and obj.raster)]
+        # When several plots read the csv file, it is read once by pgfplotstable and the plots use the table in memory.
+        shared = len(csv_plots) > 1
+        self.table_read.parameters = [plot_filepath] if shared else []
         for obj in self.axis.body:
-            if isinstance(obj, _Plot):
-                # We cannot use os.path.join, since on Windows it uses backslashes,
-                # but pgfplots can only read paths with forward slashes.
-                plot_filepath = self.plot_path + '/' + self.plot_name + '.csv'
-                obj.plot_filepath = plot_filepath.replace('//', '/')
+            if isinstance(obj, MatrixPlot) and obj.raster:
+                obj.plot_filepath = (self.plot_path + '/' + self.plot_name + '.png').replace('//', '/')
+            elif isinstance(obj, _Plot):
+                obj.plot_filepath = plot_filepath
+                obj.table_macro = self.table_read.macro if shared else None
 
         self.save_to_csv()
+        self.save_to_png()
 
-        self.axis.options += (
-            f"every axis plot/.append style={{{', '.join('='.join([k, v]) for k, v in self.default_plot_kwoptions.items())}}}",
-        )
+        return super()._build_parts()
 
-        return super().build()
+    def _build_body(self):
+        body = super()._build_body()
+        if self.externalize is not None:
+            body = [self._build_externalized_figure() if part is self.tikzpicture else part for part in body]
+        return body
+
+    def _build_externalized_figure(self):
+        """
+        Compiles the tikzpicture in a standalone pdf in the figure store if it is not already there, and returns the
+        command including it.
+        """
+        # The tikzpicture is not part of the built tree, so incremental builds never link its content to the plot.
+        # They are linked here so that modifying the content invalidates the plot.
+        self.tikzpicture._add_parent(self)
+        expand = lambda node: node._children() if isinstance(node, TexObject) else None
+        for _, node, parent in walk(self.tikzpicture, expand):
+            if parent is not None and isinstance(node, TexObject):
+                node._add_parent(parent)
+
+        requirements = _Requirements()
+        requirements.add(self)
+        with requirements.collecting():
+            tikz = self.tikzpicture.build()
+        preamble = requirements.build_preamble()
+        # The figure is compiled with the settings of the document being built, if any.
+        document_file = _building_file.get()
+        settings = () if document_file is None else (document_file.engine,
+                                                     document_file.fallback_engine,
+                                                     document_file.build_directory)
+        data_hashes = [hash_file(path) or '' for path in self._data_files()]
+        key_parts = [preamble, tikz, *data_hashes, *map(str, settings[:2])]
+        key = hashlib.sha256('\n'.join(key_parts).encode('utf8')).hexdigest()[:16]
+
+        figure_file = TexFile(f'figure-{key}', self.externalize, *settings)
+        if not os.path.exists(figure_file.pdf_path):
+            figure_file.save('\n'.join(
+                [r'\documentclass{standalone}', preamble, r'\begin{document}', tikz, r'\end{document}']))
+            figure_file.compile_to_pdf()
+
+        # Forward slashes are needed by LaTeX, even on Windows.
+        figure_path = (self.externalize + '/' + figure_file.filename + '.pdf').replace('//', '/')
+        return TexCommand('includegraphics', figure_path)
+
+
+def _as_array(data):
+    """
+    Returns the data as a numpy array, without copying it if it already is one, like a memory-mapped array. Paths of
+    .npy files are loaded as read-only memory-mapped arrays, so that their data is only read when saved to csv.
+    """
+    if isinstance(data, (str, os.PathLike)):
+        return np.load(data, mmap_mode='r')
+    return np.asarray(data)
+
+
+class _GridColumn:
+    """
+    Column of x, y or z coordinates of a matrix plot in the csv file, in the order of the points of a pgfplots mesh
+    (x varies first). The values of the rows are computed from Z block by block when the csv file is written, so that
+    the grid is never held in memory in full and Z can be a memory-mapped array larger than the memory.
+    """
+    def __init__(self, matrix_plot, axis, mask=False):
+        """
+        Args:
+            matrix_plot (MatrixPlot): Matrix plot of the column.
+            axis (int, either 0, 1 or 2): Whether the column holds the x, y or z coordinates.
+            mask (bool): If True, the points with a non-finite z have their float coordinates replaced by NaN.
+        """
+        self.X, self.Y, self.Z = matrix_plot.X, matrix_plot.Y, matrix_plot.Z
+        self.axis = axis
+        self.mask = mask
+        self.dtype = (self.X, self.Y, self.Z)[axis].dtype
+
+    def __len__(self):
+        return self.Z.size
+
+    def __getitem__(self, rows):
+        start, stop, step = rows.indices(len(self))
+        n_x = len(self.X)
+        # The rows are read from the slab of the columns of Z which contain them, so that a memory-mapped Z stored in C
+        # order is read by contiguous runs of values instead of value by value.
+        j_start, j_stop = start // n_x, max(-(-stop // n_x), start // n_x)
+        rows = slice(start - j_start * n_x, stop - j_start * n_x, step)
+        z = None
+        if self.axis == 2 or self.mask:
+            z = np.asarray(self.Z[:, j_start:j_stop]).T.ravel()[rows]
+
+        if self.axis == 0:
+            values = np.tile(self.X, j_stop - j_start)[rows]
+        elif self.axis == 1:
+            values = np.repeat(self.Y[j_start:j_stop], n_x)[rows]
+        else:
+            values = z
+        if self.mask and self.dtype.kind == 'f' and self.Z.dtype.kind == 'f':
+            values = np.where(np.isfinite(z), values, np.nan)
+        return values
+
+
+def _cells_extent(coordinates):
+    """
+    Returns the lowest and highest limits of the cells centered on equally spaced coordinates.
+    """
+    low, high = sorted((float(coordinates[0]), float(coordinates[-1])))
+    half_step = (high - low) / (len(coordinates) - 1) / 2 if len(coordinates) > 1 else .5
+    return low - half_step, high + half_step
+
+
+def _check_decimation(decimation):
+    if decimation not in decimation_methods:
+        raise ValueError(f"Invalid decimation {decimation!r}. Should be one of {', '.join(decimation_methods)}.")
+    return decimation
+
+
+def _check_max_points(max_points, decimation):
+    if max_points is not None and decimation is not None and max_points < min_points[decimation]:
+        raise ValueError(f"Invalid max_points {max_points!r}. The decimation {decimation!r} needs at least "
+                         f"{min_points[decimation]} points.")
+    return max_points
+
+
+def _decimate(X, Y, max_points, decimation):
+    """
+    Returns the coordinates of a line plot decimated to at most 'max_points' points (see python2latex.decimation).
+    """
+    length = min(len(X), len(Y))
+    if max_points is None or length <= max_points:
+        return [X, Y]
+    _check_max_points(max_points, decimation)
+    indices = decimation_methods[decimation](X[:length], Y[:length], max_points)
+    return [X[:length][indices], Y[:length][indices]]
+
+
+def _check_non_finite(non_finite):
+    if non_finite not in (None, 'drop', 'mask'):
+        raise ValueError(f"Invalid non_finite {non_finite!r}. Should be None, 'drop' or 'mask'.")
+    return non_finite
+
+
+def _check_float_format(float_format):
+    if float_format is not None and ',' in format(-1234567.5, float_format):
+        # The floats are written unquoted in the csv file, so a comma would split them across columns.
+        raise ValueError(f"Invalid float_format {float_format!r}. Formatted floats should not contain commas, which "
+                         f"delimit the columns of the csv file.")
+    return float_format
+
+
+def _clean_non_finite(columns, non_finite):
+    """
+    Returns the columns of coordinates of a plot where the points with a NaN or infinite coordinate are either dropped
+    (non_finite='drop') or have all their float coordinates replaced by NaN (non_finite='mask').
+    """
+    columns = [np.asarray(column) for column in columns]
+    float_columns = [column for column in columns if column.dtype.kind == 'f']
+    if non_finite is None or not float_columns:
+        return columns
+
+    length = min(len(column) for column in columns)
+    finite = np.logical_and.reduce([np.isfinite(column[:length]) for column in float_columns])
+    if finite.all():
+        return columns
+    if non_finite == 'drop':
+        return [column[:length][finite] for column in columns]
+    return [np.where(finite, column[:length], np.nan) if column.dtype.kind == 'f' else column[:length]
+            for column in columns]
+
+
+def _write_csv_columns(file, titles, columns, float_formats=None, block_size=2**16):
+    """
+    Writes columns of data to a csv file, like csv.writer would with rows padded with empty strings, but formatting
+    whole blocks of each column with numpy and writing each block at once instead of row by row.
+
+    Args:
+        file (file-like object): Text file opened with newline=''.
+        titles (list of str): Titles of the columns.
+        columns (list of sequences): Columns of data, possibly of different lengths. Arrays, memory-mapped arrays and
+        other objects with a dtype are only sliced block by block, never copied in full.
+        float_formats (list of (str or None) or None): Float format of each column, like '.3f'. Floats of columns
+        without a format are written with full precision.
+        block_size (int): Number of rows formatted and written at once.
+    """
+    columns = [column if hasattr(column, 'dtype') else np.asarray(column) for column in columns]
+    float_formats = float_formats or [None] * len(columns)
+    n_rows = max((len(column) for column in columns), default=0)
+    file.write(','.join(_quote_csv(title) for title in titles) + '\r\n')
+    for start in range(0, n_rows, block_size):
+        stop = min(start + block_size, n_rows)
+        block = [_format_column(column[start:stop], stop - start, float_format)
+                 for column, float_format in zip(columns, float_formats)]
+        file.write('\r\n'.join(map(','.join, zip(*block))) + '\r\n')
+
+
+def _format_column(values, length, float_format=None):
+    """
+    Returns the list of strings of the values of a block of a column, padded with empty strings up to 'length'.
+    """
+    if float_format is not None and values.dtype.kind == 'f':
+        strings = _format_floats(values.tolist(), float_format)
+    elif values.dtype == np.float64 or values.dtype.kind in 'iub':
+        # Python formats its floats and ints as numpy does, but faster.
+        strings = list(map(str, values.tolist()))
+    else:
+        strings = values.astype(str).tolist()
+        if values.dtype.kind in 'OSU':
+            strings = [_quote_csv(string) for string in strings]
+    return strings + [''] * (length - len(strings))
+
+
+def _format_floats(values, float_format):
+    """
+    Formats a list of floats with a standard Python float format. The whole list is formatted with a single printf-style
+    operation when the format allows it, which is much faster than formatting the floats one by one.
+    """
+    try:
+        return ((f'%{float_format}\n' * len(values)) % tuple(values)).split('\n')[:-1]
+    except (ValueError, TypeError):  # Format specifications unknown to printf, like '.3'
+        return list(map(f'{{:{float_format}}}'.format, values))
+
+
+def _quote_csv(string):
+    if any(char in string for char in ',"\r\n'):
+        return '"' + string.replace('"', '""') + '"'
+    return string
+
+
+class _Axis(TexEnvironment):
+    """
+    pgfplots 'axis' environment of a Plot. The default plot options of the Plot are appended to the options of the
+    axis when building, without modifying them.
+    """
+    def __init__(self, plot, *parameters, **kwargs):
+        """
+        Args:
+            plot (Plot): Plot containing the axis.
+            parameters, kwargs: See TexEnvironment.
+        """
+        super().__init__('axis', *parameters, **kwargs)
+        self.plot = plot
+
+    def _build_parts(self):
+        default_plot_kwoptions = ', '.join('='.join([k, v]) for k, v in self.plot.default_plot_kwoptions.items())
+        head = begin(*self.head.parameters,
+                     options=(*self.options, f"every axis plot/.append style={{{default_plot_kwoptions}}}"),
+                     **self.kwoptions)
+        return [head] + super()._build_parts()[1:]
+
+
+class _TableRead(TexCommand):
+    """
+    pgfplotstable command reading the csv file of a Plot into a macro, from which all the plots of the Plot take their
+    columns, so that the file is parsed only once. The path of the file is the parameter of the command. Without
+    parameter, nothing is read and the command builds to an empty string.
+    """
+    def __init__(self, macro=r'\datatable'):
+        super().__init__('pgfplotstableread', options='col sep=comma', options_pos='first')
+        self.macro = macro
+
+    def build(self):
+        if not self.parameters:
+            return ''
+        return super().build() + self.macro
 
 
 class _Plot(TexCommand):
@@ -270,80 +661,172 @@ class _Plot(TexCommand):
         self.id_number = 1 * _Plot.plot_count
         _Plot.plot_count += 1
         self.plot_filepath = None
+        self.table_macro = None
         super().__init__('addplot', options=options, options_pos='first', **kwoptions)
 
+    def _build_table(self, columns):
+        """
+        Returns the 'table' part of the command, which reads the columns from the table macro of the Plot if it is set,
+        else directly from the csv file.
+        """
+        if self.table_macro is not None:
+            return f" table[{columns}]{{{self.table_macro}}};"
+        assert self.plot_filepath is not None
+        return f" table[{columns}, col sep=comma]{{{self.plot_filepath}}};"
+
 
 class LinePlot(_Plot):
     """
     LinePlot object to handle line plots.
     """
-    def __init__(self, X, Y, *options, legend=None, forget_plot=True, **kwoptions):
+    def __init__(self,
+                 X,
+                 Y,
+                 *options,
+                 legend=None,
+                 forget_plot=True,
+                 float_format=None,
+                 non_finite=None,
+                 max_points=None,
+                 decimation=None,
+                 **kwoptions):
         """
         Adds a plot to the axis.
 
         Args:
-            X (sequence of numbers): X coordinates.
-            Y (sequence of numbers): Y coordinates.
+            X (sequence of numbers, array or str): X coordinates. Arrays, including memory-mapped arrays, are used
+            without being copied, so they should not be modified before the plot is built. A str is the path of a .npy
+            file, which is memory-mapped.
+            Y (sequence of numbers, array or str): Y coordinates, of the same length as X. See X.
             options (Union[Tuple[str], str, TexObject]): Options for the plot. Colors can be specified here as strings
             of the whole color, e.g. 'black', 'red', 'blue', etc. See pgfplots '\addplot[options]' for possible options.
             All underscores are replaced by spaces when converted to LaTeX.
             legend (str): Entry of the plot.
             forget_plot (bool): Either or not to forget plot when adding plot. In some case, like histogram, the forget plot
             don't allow to have multiple plots near each other. By default the forget plot is activated.
+            float_format (str or None): Standard Python float format, like '.3f' or '.6g', of the coordinates saved to
+            the csv file. If None, the format of the Plot is used.
+            non_finite (str or None): Either 'drop' or 'mask'. See Plot. If None, the behavior of the Plot is used.
+            max_points (int or None): Maximum number of points saved to the csv file. See Plot. If None, the
+            'max_points' of the Plot is used.
+            decimation (str or None): Either 'minmax' or 'lttb'. See Plot. If None, the algorithm of the Plot is used.
             kwoptions (tuple of str): Keyword options for the plot. See pgfplots '\addplot[kwoptions]' for possible
             options. All underscores are replaced by spaces when converted to LaTeX.
         """
-        # self.X = np.array([x for x in X])
-        # self.Y = np.array([y for y in Y])
-        self.X = np.array(X)
-        self.Y = np.array(Y)
+        self.X = _as_array(X)
+        self.Y = _as_array(Y)
+        if self.X.ndim != 1 or self.X.shape != self.Y.shape:
+            raise ValueError(f'X and Y should be 1D sequences of the same length, got shapes {self.X.shape} and '
+                             f'{self.Y.shape}.')
         self.legend = legend
         self.forget_plot = forget_plot
+        self.float_format = _check_float_format(float_format)
+        self.non_finite = _check_non_finite(non_finite)
+        self.decimation = decimation if decimation is None else _check_decimation(decimation)
+        self.max_points = _check_max_points(max_points, self.decimation)
+        if non_finite == 'mask':
+            kwoptions['unbounded coords'] = 'jump'
         super().__init__(*options, **kwoptions)
 
     def build(self):
-        assert self.plot_filepath is not None
+        options = self.options
         legend = ''
         if self.legend:
             legend = f"\n\\addlegendentry{{{self.legend}}};"
         elif self.forget_plot:
-            self.options += ('forget plot', )
+            options = [*self.options, 'forget plot']
 
-        return super().build(
-        ) + f" table[x=x{self.id_number}, y=y{self.id_number}, col sep=comma]{{{self.plot_filepath}}};" + legend
+        return self._build_command(options, self.kwoptions) \
+            + self._build_table(f"x=x{self.id_number}, y=y{self.id_number}") + legend
 
 
 class MatrixPlot(_Plot):
     """
     MatrixPlot object to handle matrix/image plots AKA heatmaps AKA colormaps.
     """
-    def __init__(self, X, Y, Z, *options, point_meta='explicit', **kwoptions):
+    def __init__(self,
+                 X,
+                 Y,
+                 Z,
+                 *options,
+                 point_meta='explicit',
+                 float_format=None,
+                 non_finite=None,
+                 raster=False,
+                 **kwoptions):
         """
         Adds a matrix plot to the axis.
 
         Args:
-            X (sequence of numbers): X coordinates. Should have the same length as the first dimension of Z.
-            Y (sequence of numbers): Y coordinates. Should have the same length as the second dimension of Z.
-            Z (Array of numbers of dim (x_dim, y_dim)): Z coordinates.
+            X (sequence of numbers, array or str): X coordinates. Should have the same length as the first dimension of
+            Z.
+            Y (sequence of numbers, array or str): Y coordinates. Should have the same length as the second dimension
+            of Z.
+            Z (Array of numbers of dim (x_dim, y_dim) or str): Z coordinates. Arrays, including memory-mapped arrays,
+            are used without being copied and are written to the csv file block by block of columns, which is fastest
+            for arrays in Fortran order. A str is the path of a .npy file, which is memory-mapped. Note that when the
+            document is built with workers, memory-mapped arrays are pickled in full to be sent to the workers.
             options (Union[Tuple[str], str, TexObject]): Options for the plot. See pgfplots '\addplot[options]'
             for possible options. All underscores are replaced by spaces when converted to LaTeX.
             colorbar (str): Colorbar legend.
+            float_format (str or None): Standard Python float format, like '.3f' or '.6g', of the coordinates saved to
+            the csv file. If None, the format of the Plot is used.
+            non_finite (str or None): Only 'mask' is supported: non-finite values are saved as NaN and left blank in the
+            plot ('unbounded coords=jump').
+            raster (bool): If True, the plot is an image of Z colored with the 'viridis' colormap (see
+            python2latex.raster), included with '\addplot graphics' at the extent of the cells of the grid of X and Y,
+            which should be equally spaced. The image is written with 'write_png'.
             kwoptions (tuple of str): Keyword options for the plot. See pgfplots '\addplot[kwoptions]' for possible
             options. All underscores are replaced by spaces when converted to LaTeX.
         """
-        self.X = np.array(X)
-        self.Y = np.array(Y)
-        self.Z = np.array([[z for z in z_row] for z_row in Z])
-        assert self.Z.shape == self.X.shape + self.Y.shape
+        if non_finite not in (None, 'mask'):
+            raise ValueError(f"Invalid non_finite {non_finite!r} for a matrix plot. Should be None or 'mask'.")
+        self.float_format = _check_float_format(float_format)
+        self.non_finite = non_finite
+        self.raster = raster
+        if non_finite == 'mask' and not raster:
+            kwoptions['unbounded coords'] = 'jump'
+        self.X = _as_array(X)
+        self.Y = _as_array(Y)
+        self.Z = _as_array(Z)
+        if self.X.ndim != 1 or self.Y.ndim != 1 or self.Z.shape != self.X.shape + self.Y.shape:
+            raise ValueError(f'Z should be of shape (len(X), len(Y)) = {self.X.shape + self.Y.shape}, got '
+                             f'{self.Z.shape}.')
+
+        if raster:
+            self.z_range = finite_range(self.Z)
+            kwoptions['xmin'], kwoptions['xmax'] = map(str, _cells_extent(self.X))
+            kwoptions['ymin'], kwoptions['ymax'] = map(str, _cells_extent(self.Y))
+            super().__init__(*options, **kwoptions)
+            self.command = 'addplot graphics'
+            return
 
         kwoptions['point meta'] = point_meta
         kwoptions['mesh/rows'] = str(len(self.Y))
         kwoptions['mesh/cols'] = str(len(self.X))
         super().__init__('matrix plot*', *options, **kwoptions)
 
-    def build(self):
-        assert self.plot_filepath is not None
+    def write_png(self, file, block_rows=256):
+        """
+        Writes Z as a PNG image in raster mode, colored by blocks of rows so that a memory-mapped Z is never loaded in
+        full.
 
-        return super().build(
-        ) + f" table[x=x{self.id_number}, y=y{self.id_number}, meta=z{self.id_number}, " \
-            f"col sep=comma]{{{self.plot_filepath}}};"
+        Args:
+            file (file-like object): Binary file.
+            block_rows (int): Number of rows of the image colored and compressed at once.
+        """
+        # Rows of the image are the columns of Z, from the top (largest y) to the bottom.
+        image = self.Z.T
+        if self.Y[-1] >= self.Y[0]:
+            image = image[::-1]
+        if self.X[-1] < self.X[0]:
+            image = image[:, ::-1]
+        blocks = (apply_colormap(image[start:start + block_rows], *self.z_range)
+                  for start in range(0, len(image), block_rows))
+        write_png(file, blocks, width=len(self.X), height=len(self.Y))
+
+    def build(self):
+        if self.raster:
+            assert self.plot_filepath is not None
+            return super().build() + f"{{{self.plot_filepath}}};"
+        return super().build() + self._build_table(f"x=x{self.id_number}, y=y{self.id_number}, meta=z{self.id_number}")
@@ -0,0 +1,151 @@
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+
+class BuildProfiler:
+    """
+    Records the wall time, the number of calls and the number of bytes of tex emitted while building, per class of
+    object and per named object (name of a Section, 'plot_name' of a Plot, label of a Table, etc.). The time spent
+    saving plot data to csv and compiling to pdf is also recorded.
+
+    Times of environments are inclusive: they include the time spent building everything inside them, but not the time
+    spent by the caller consuming the built parts (for example, writing them to a file).
+
+    Usage example:
+    >>> from python2latex import Document, BuildProfiler
+    >>> doc = Document('Title')
+    >>> with BuildProfiler() as profiler:
+    ...     doc.build(compile_to_pdf=False, show_pdf=False)
+    >>> print(profiler.report())
+    >>> profiler.to_json('profile.json')
+
+    Alternatively, call Document.build with 'profile=True' and read the 'build_profile' attribute of the document.
+
+    The active profilers are local to the thread or asyncio task which entered them. The asynchronous APIs, like
+    Document.build_async, run their steps in the context of the caller, so that they are recorded too.
+    """
+    def __init__(self):
+        self.by_class = {}
+        self.by_name = {}
+        self.operations = {}
+
+    @classmethod
+    def current(cls):
+        """
+        Returns the innermost active profiler or None if there is none. This is the hook used by the building code.
+        """
+        active = _active_profilers.get()
+        return active[-1] if active else None
+
+    def __enter__(self):
+        _active_profilers.set(_active_profilers.get() + (self,))
+        return self
+
+    def __exit__(self, *exc):
+        active = list(_active_profilers.get())
+        active.remove(self)
+        _active_profilers.set(tuple(active))
+
+    @staticmethod
+    def _add(stats, key, seconds, n_bytes):
+        if key not in stats:
+            stats[key] = {'calls': 0, 'time': 0., 'bytes': 0}
+        stat = stats[key]
+        stat['calls'] += 1
+        stat['time'] += seconds
+        stat['bytes'] += n_bytes
+
+    def record_node(self, node, seconds, n_bytes=0):
+        """
+        Records the building of a node.
+
+        Args:
+            node (TexObject): The object built.
+            seconds (float): Wall time spent building the object.
+            n_bytes (int): Number of bytes of tex emitted by the object.
+        """
+        class_name = type(node).__name__
+        self._add(self.by_class, class_name, seconds, n_bytes)
+        name = _node_name(node)
+        if name:
+            self._add(self.by_name, f'{class_name} {name}', seconds, n_bytes)
+
+    def record_operation(self, operation, name, seconds):
+        """
+        Records an operation other than building, such as saving to csv or compiling.
+
+        Args:
+            operation (str): Name of the operation, like 'Plot.save_to_csv'.
+            name (str): Name of the object on which the operation was done.
+            seconds (float): Wall time spent in the operation.
+        """
+        self._add(self.operations, f'{operation} {name}', seconds, 0)
+
+    def to_dict(self):
+        return {'by_class': self.by_class, 'by_name': self.by_name, 'operations': self.operations}
+
+    def to_json(self, filepath=None):
+        """
+        Exports the results as JSON.
+
+        Args:
+            filepath (str or None): If not None, the JSON is also written to this file.
+
+        Returns the JSON string.
+        """
+        results = json.dumps(self.to_dict(), indent=2)
+        if filepath is not None:
+            with open(filepath, 'w', encoding='utf8') as file:
+                file.write(results)
+        return results
+
+    def report(self):
+        """
+        Returns a human readable report of the results, sorted by decreasing time in each section.
+        """
+        lines = []
+        for title, stats in [('Per class', self.by_class),
+                             ('Per named object', self.by_name),
+                             ('Operations', self.operations)]:
+            if not stats:
+                continue
+            lines.append(f'{title}:')
+            lines.append(f"{'':<50} {'calls':>10} {'time (s)':>12} {'bytes':>14}")
+            for key, stat in sorted(stats.items(), key=lambda item: -item[1]['time']):
+                lines.append(f"{key[:50]:<50} {stat['calls']:>10} {stat['time']:>12.6f} {stat['bytes']:>14}")
+            lines.append('')
+        return '\n'.join(lines)
+
+
+# Stack of the active profilers, innermost last
+_active_profilers = ContextVar('python2latex_profilers', default=())
+
+
+@contextmanager
+def profile_operation(operation, name):
+    """
+    Times the operation in the 'with' block for the active profiler, if any.
+    """
+    profiler = BuildProfiler.current()
+    if profiler is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        profiler.record_operation(operation, name, perf_counter() - start)
+
+
+def _node_name(node):
+    """
+    Returns a name identifying the node to the user, or None if the node has none.
+    """
+    plot_name = getattr(node, 'plot_name', None)
+    if plot_name:
+        return plot_name
+    if node.name in ('section', 'subsection', 'subsubsection') and len(getattr(node, 'parameters', ())) > 1:
+        return node.parameters[1]
+    return getattr(node, 'label', None) or None
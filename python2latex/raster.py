@@ -0,0 +1,107 @@
+"""
+Conversion of matrices to colormapped PNG images, with numpy and the standard library only, so that very large matrix
+plots can be included as images instead of being typeset point by point by pgfplots.
+"""
+import struct
+import zlib
+
+import numpy as np
+
+# Samples of the 'viridis' colormap, equally spaced, as RGB values between 0 and 255.
+viridis = (
+    (68, 1, 84),
+    (71, 44, 122),
+    (59, 81, 139),
+    (44, 113, 142),
+    (33, 144, 141),
+    (39, 173, 129),
+    (92, 200, 99),
+    (170, 220, 50),
+    (253, 231, 37),
+)
+
+_colormap_levels = 1024
+
+
+def pgfplots_colormap(name, colors=viridis):
+    """
+    Returns the value of the pgfplots 'colormap' key defining a colormap of the given equally spaced colors, so that
+    the colorbar of the axis matches the colors of the images produced by 'apply_colormap'.
+    """
+    return f'{{{name}}}{{' + '; '.join(f'rgb255({i}cm)=({r},{g},{b})' for i, (r, g, b) in enumerate(colors)) + '}'
+
+
+def finite_range(Z, block_rows=1024):
+    """
+    Returns the minimum and the maximum of the finite values of Z, read by blocks of rows so that memory-mapped arrays
+    are never loaded in full. If there are no finite values or if they are all equal, the range is widened to a length
+    of 1 so that it can be used to normalize Z.
+    """
+    z_min, z_max = np.inf, -np.inf
+    for start in range(0, len(Z), block_rows):
+        block = np.asarray(Z[start:start + block_rows], dtype=float)
+        block = block[np.isfinite(block)]
+        if block.size:
+            z_min, z_max = min(z_min, block.min()), max(z_max, block.max())
+    if z_min > z_max:
+        return 0., 1.
+    if z_min == z_max:
+        return float(z_min), float(z_min) + 1
+    return float(z_min), float(z_max)
+
+
+def apply_colormap(values, z_min, z_max, colors=viridis):
+    """
+    Maps the values linearly from [z_min, z_max] to the equally spaced colors, interpolated linearly like pgfplots does.
+
+    Args:
+        values (array of numbers): Values to map.
+        z_min, z_max (float): Values mapped to the first and the last colors. Values outside are clipped.
+        colors (sequence of (r, g, b) tuples): RGB colors between 0 and 255.
+
+    Returns an array of uint8 of shape values.shape + (4,) of RGBA colors, where non-finite values are transparent.
+    """
+    # The colors are interpolated once in a table of levels finer than the 256 values of a channel, which is indexed
+    # with the quantized values, the last level being the transparent color of non-finite values.
+    colors = np.asarray(colors, dtype=float)
+    levels = np.linspace(0, 1, _colormap_levels)
+    table = np.zeros((_colormap_levels + 1, 4), dtype=np.uint8)
+    for channel in range(3):
+        table[:-1, channel] = np.round(np.interp(levels, np.linspace(0, 1, len(colors)), colors[:, channel]))
+    table[:-1, 3] = 255
+
+    values = np.asarray(values, dtype=float)
+    with np.errstate(invalid='ignore'):
+        indices = np.clip((values - z_min) * ((_colormap_levels - 1) / (z_max - z_min)), 0, _colormap_levels - 1)
+    indices = np.where(np.isfinite(values), np.round(indices), _colormap_levels).astype(np.intp)
+    return table[indices]
+
+
+def write_png(file, blocks, width, height):
+    """
+    Writes an RGBA image to a PNG file. The image is given by blocks of rows, each compressed as soon as it is received,
+    so that the whole image never has to be held in memory.
+
+    Args:
+        file (file-like object): Binary file.
+        blocks (iterable of arrays of uint8 of shape (n_rows, width, 4)): Blocks of rows of RGBA colors of the image,
+        from top to bottom, like the outputs of 'apply_colormap'.
+        width, height (int): Size of the image in pixels.
+    """
+    file.write(b'\x89PNG\r\n\x1a\n')
+    _write_chunk(file, b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))  # 8 bits RGBA, no interlace
+
+    compressor = zlib.compressobj(level=1)  # Much faster than the default, for a similar size
+    for block in blocks:
+        # Each row starts with the byte of its filter type, 0 for none.
+        rows = np.concatenate([np.zeros((len(block), 1), dtype=np.uint8), block.reshape(len(block), -1)], axis=1)
+        data = compressor.compress(rows.tobytes())
+        if data:
+            _write_chunk(file, b'IDAT', data)
+    _write_chunk(file, b'IDAT', compressor.flush())
+    _write_chunk(file, b'IEND', b'')
+
+
+def _write_chunk(file, chunk_type, data):
+    file.write(struct.pack('>I', len(data)) + chunk_type + data)
+    file.write(struct.pack('>I', zlib.crc32(chunk_type + data) & 0xffffffff))
@@ -1,7 +1,8 @@
 import numpy as np
 
 from python2latex import FloatingTable, FloatingEnvironmentMixin
-from python2latex import TexEnvironment, TexCommand, build, bold, italic
+from python2latex import TexEnvironment, TexObject, TexCommand, build, bold, italic
+from python2latex.tex_environment import begin
 """
 TODO:
     - Convert 'multicell' into Multirow and Multicol Tex commands
@@ -12,6 +13,8 @@ class Rule(TexCommand):
     """
     Simple rule object to handle rules added to tables.
     """
+    __slots__ = ('start', 'end', 'trim')
+
     def __init__(self, start, end, trim):
         """
         Args:
@@ -92,6 +95,9 @@ class Table(FloatingEnvironmentMixin, super_class=FloatingTable):
         self.multicells = []
         self.highlights = []
         self.formats = np.full(shape, None, dtype=object)
+        # TexObjects created by the callable formats and the highlights during the last build, whose packages are
+        # collected with those of the table
+        self._build_time_cells = []
 
     def __getitem__(self, idx):
         return SelectedArea(self, idx)
@@ -103,34 +109,48 @@ class Table(FloatingEnvironmentMixin, super_class=FloatingTable):
             selected_area.multicell(value)
         else:
             self.data[idx] = value
+        self.invalidate()
 
     def __repr__(self):
         return repr(self.data)
 
+    def _children(self):
+        cells = [cell for cell in self.data.flat if isinstance(cell, TexObject)]
+        rules = [rule for rules in self.rules.values() for rule in rules]
+        return super()._children() + cells + rules + self._build_time_cells
+
+    def _format_cell(self, i, j):
+        """
+        Returns the value of the cell (i, j) formatted with the format of the cell.
+        """
+        value = self.data[i, j]
+        cell_format = self.formats[i, j]
+        if cell_format is not None and not isinstance(cell_format, str): # Callable
+            return cell_format(value)
+        elif cell_format is not None and isinstance(value, (float, int)): # String
+            return f'{{:{cell_format}}}'.format(value)
+        elif cell_format is None and isinstance(value, float): # Fallback to default
+            return f'{{:{self.float_format}}}'.format(value)
+        elif cell_format is None and isinstance(value, int):
+            return f'{{:{self.int_format}}}'.format(value)
+        return value
+
     def _format_cells(self):
-        for i, row in enumerate(self.data):
-            for j, value in enumerate(row):
-                cell_format = self.formats[i, j]
-                if cell_format is not None and not isinstance(cell_format, str): # Callable
-                    self.data[i, j] = cell_format(value)
-                elif cell_format is not None and isinstance(value, (float, int)): # String
-                    self.data[i, j] = f'{{:{cell_format}}}'.format(value)
-                elif cell_format is None and isinstance(value, float): # Fallback to default
-                    self.data[i, j] = f'{{:{self.float_format}}}'.format(value)
-                elif cell_format is None and isinstance(value, int):
-                    self.data[i, j] = f'{{:{self.int_format}}}'.format(value)
-
-    def _apply_highlights(self):
+        """
+        Returns a copy of the data where the values are formatted with the format of their cell.
+        """
+        data = self.data.copy()
+        for i, j in np.ndindex(*data.shape):
+            data[i, j] = self._format_cell(i, j)
+        return data
+
+    def _apply_highlights(self, data):
         for i, j, highlight in self.highlights:
-            if highlight == 'bold':
-                highlight = bold
-            elif highlight == 'italic':
-                highlight = italic
-            self.data[i, j] = highlight(self.data[i, j])
+            data[i, j] = _highlight_function(highlight)(data[i, j])
 
-    def _generate_table_format(self):
+    def _generate_table_format(self, data):
         """
-        Generates table format and applies multicells if needed.
+        Generates table format and applies multicells to the data if needed.
         """
         table_format = np.array([[' & '] * (self.shape[1] - 1) + [r'\\']] * self.shape[0],
                                 dtype=object)
@@ -144,44 +164,67 @@ class Table(FloatingEnvironmentMixin, super_class=FloatingTable):
             cell_shape = table_format[idx].shape
 
             if start_i == stop_i - 1:
-                self.data[
+                data[
                     start_i,
-                    start_j] = f"\\multicolumn{{{cell_shape[1]}}}{{{h_align}}}{{{self.data[start_i, start_j]}}}"
+                    start_j] = f"\\multicolumn{{{cell_shape[1]}}}{{{h_align}}}{{{data[start_i, start_j]}}}"
             else:
                 shift = ''
                 if v_shift:
                     shift = f'[{v_shift}]'
-                self.data[
+                data[
                     start_i,
-                    start_j] = f"\\multirow{{{cell_shape[0]}}}{{{v_align}}}{shift}{{{self.data[start_i, start_j]}}}"
+                    start_j] = f"\\multirow{{{cell_shape[0]}}}{{{v_align}}}{shift}{{{data[start_i, start_j]}}}"
 
             if start_j < stop_j - 1 and start_i < stop_i - 1:
-                self.data[
+                data[
                     start_i,
-                    start_j] = f"\\multicolumn{{{cell_shape[1]}}}{{{h_align}}}{{{self.data[start_i, start_j]}}}"
+                    start_j] = f"\\multicolumn{{{cell_shape[1]}}}{{{h_align}}}{{{data[start_i, start_j]}}}"
 
         return table_format
 
-    def build(self):
-        self.tabular.head.parameters += (''.join(self.alignment), )
-        if self.top_rule:
-            self.tabular.body.append(r"\toprule")
+    def _build_body(self):
+        """
+        Formats the data into a new 'tabular' environment that replaces 'self.tabular' in the built body. Neither the
+        data nor 'self.tabular' are modified, so that the table can be built many times.
+        """
+        data = self._format_cells()
+        self._apply_highlights(data)
+        self._build_time_cells = [cell for cell, value in zip(data.flat, self.data.flat)
+                                  if isinstance(cell, TexObject) and cell is not value]
+        table_format = self._generate_table_format(data)
+
+        tabular = TexEnvironment('tabular')
+        tabular.head = begin(*self.tabular.head.parameters,
+                             ''.join(self.alignment),
+                             options=self.tabular.options,
+                             **self.tabular.kwoptions)
+        tabular.body = list(self.tabular.body)
 
-        self._format_cells()
-        self._apply_highlights()
-        table_format = self._generate_table_format()
+        if self.top_rule:
+            tabular.body.append(r"\toprule")
 
-        for i, (row, row_format) in enumerate(zip(self.data, table_format)):
-            self.tabular.body.append(''.join(
-                str(build(item, self)) for pair in zip(row, row_format) for item in pair))
+        for i, (row, row_format) in enumerate(zip(data, table_format)):
+            tabular.body.append(''.join(
+                str(build(item)) for pair in zip(row, row_format) for item in pair))
             if i in self.rules:
                 for rule in self.rules[i]:
-                    self.tabular.body.append(build(rule))
+                    tabular.body.append(build(rule))
 
         if self.bottom_rule:
-            self.tabular.append(r'\bottomrule')
+            tabular.body.append(r'\bottomrule')
 
-        return super().build()
+        return [tabular if obj is self.tabular else obj for obj in super()._build_body()]
+
+
+def _highlight_function(highlight):
+    """
+    Returns the callable applying a highlight, which is either 'bold', 'italic' or already a callable.
+    """
+    if highlight == 'bold':
+        return bold
+    elif highlight == 'italic':
+        return italic
+    return highlight
 
 
 class SelectedArea:
@@ -210,6 +253,7 @@ class SelectedArea:
     @data.setter
     def data(self, value):
         self.table.data[self.slices] = value
+        self.table.invalidate()
 
     @property
     def size(self):
@@ -235,6 +279,7 @@ class SelectedArea:
             format (Union[str, callable]): If str, should be a valid Python string format such as '.2f' for float with 2 decimals for example. If callable, will receive the value of the cell and should return a string in place.
         """
         self.table.formats[self.slices] = new_format
+        self.table.invalidate()
 
     def add_rule(self, position='below', trim_right=False, trim_left=False):
         """
@@ -263,6 +308,7 @@ class SelectedArea:
         if i not in self.table.rules:
             self.table.rules[i] = []
         self.table.rules[i].append(Rule(j_start, j_stop, r + l))
+        self.table.invalidate()
 
         return self
 
@@ -286,6 +332,7 @@ class SelectedArea:
         self.table.multicells.append(multicell_params)  # Save position of multiple cells span
 
         self.table.data[self.idx[0]] = value
+        self.table.invalidate()
 
         return self
 
@@ -302,6 +349,7 @@ class SelectedArea:
         for i in range(i_start, i_stop):
             for j in range(j_start, j_stop):
                 self.table.highlights.append((i, j, highlight))
+        self.table.invalidate()
 
         return self
 
@@ -343,6 +391,7 @@ class SelectedArea:
             start_i, start_j = self.idx[0]
             for i, j in best_idx:
                 self.table.highlights.append((i + start_i, j + start_j, highlight))
+            self.table.invalidate()
 
         return self
 
@@ -375,6 +424,7 @@ class SelectedArea:
                          bottom_rule=False,
                          top_rule=False)
         self.data = subtable
+        subtable._add_parent(self.table)  # Modifying the subtable invalidates the table.
 
         subtable[:,:].change_format(self.table.formats[self.slices])
 
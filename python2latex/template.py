@@ -1,3 +1,6 @@
+import asyncio
+from contextvars import copy_context
+
 from python2latex import TexFile, build
 from python2latex.utils import open_file_with_default_program
 """
@@ -21,20 +24,30 @@ class Template:
 
     See the examples for a more complete example.
     """
-    def __init__(self, filename, filepath='.', output_filename=None, output_filepath=None):
+    def __init__(self,
+                 filename,
+                 filepath='.',
+                 output_filename=None,
+                 output_filepath=None,
+                 engine='pdflatex',
+                 fallback_engine=None,
+                 build_directory=None):
         """
         Args:
             filename (str): Name of the input tex file without extension.
             filepath (str): Path where the input file is.
             output_filename (str or None): Name of the output file without the extension. If None, the name of the input file appended with '_rendered' will be used. If the output filename is the same as the input filename, the input filename will be overwrited, which can be useful but also dangerous if there is a problem in the code.
             output_filepath (str): Path where the rendered files will be placed. If None, the path of the input file will be used.
+            engine (str): TeX engine used to compile the rendered file, like 'pdflatex', 'lualatex' or 'xelatex'.
+            fallback_engine (str or None): Engine with which to retry the compilation if 'engine' runs out of memory, like 'lualatex' which allocates its memory dynamically. See TexFile.
+            build_directory (BuildDirectory or None): If not None, the rendered file is compiled in a scratch directory and only the pdf is copied to the output filepath.
         """
         self.input_file = TexFile(filename, filepath)
         if output_filename is None:
             output_filename = filename + '_rendered'
         if output_filepath is None:
             output_filepath = filepath
-        self.output_file = TexFile(output_filename, output_filepath)
+        self.output_file = TexFile(output_filename, output_filepath, engine, fallback_engine, build_directory)
         self.anchors = {}
 
     def _load_tex_file(self):
@@ -89,25 +102,72 @@ class Template:
         if lines_to_add:
             preamble.extend(['%! python2latex-preamble'] + lines_to_add)
 
-    def render(self, compile_to_pdf=True, show_pdf=True):
+    def collect_data_files(self):
         """
-        Loads the input files, parses the tex to find the anchors, inserts the code generated by python2latex then saves it to disk.
-
-        Args:
-            compile_to_pdf (bool): If True, automatically call pdflatex to compile the generated tex file to pdf.
+        Returns the list of the paths of the data files, like the csv files of plots, of the objects at the anchors.
+        """
+        return [path for obj in self.anchors.values() for path in obj.collect_data_files()]
 
-            show_pdf (bool): If True, the default pdf reader will be called to show the compiled pdf. This may not work well with non-read-only pdf viewer such as Acrobat Reader or Foxit Reader. Suggested readers are SumatraPDF on Windows and Okular or Evince on Linux.
+    def _render_tex(self):
+        """
+        Inserts the tex of the anchors in the input file and saves it to the output file.
         """
         tex = self._load_tex_file()
         preamble, doc = self._split_preamble(tex)
         self._insert_tex_at_anchors(doc)
+        # The body is built first so that the packages of the cells created while building tables are collected
+        body = [build(line) for line in doc]
         self._update_preamble(preamble)
-        tex = '\n'.join(build(line) for line in preamble + doc)
+        tex = '\n'.join([build(line) for line in preamble] + body)
 
         self.output_file.save(tex)
 
+    def render(self, compile_to_pdf=True, show_pdf=True, skip_unchanged=False, format_cache=None, max_passes=1):
+        """
+        Loads the input files, parses the tex to find the anchors, inserts the code generated by python2latex then saves it to disk.
+
+        Args:
+            compile_to_pdf (bool): If True, automatically call pdflatex to compile the generated tex file to pdf.
+
+            show_pdf (bool): If True, the default pdf reader will be called to show the compiled pdf. This may not work well with non-read-only pdf viewer such as Acrobat Reader or Foxit Reader. Suggested readers are SumatraPDF on Windows and Okular or Evince on Linux.
+
+            skip_unchanged (bool): If True, the compilation to pdf is skipped when the rendered tex file and the csv files of the plots are identical to those of the last compilation. See TexFile.compile_to_pdf.
+
+            format_cache (str or None): Directory where to cache the precompiled preamble. See TexFile.compile_to_pdf.
+
+            max_passes (int): Maximum number of pdflatex passes. Passes after the first are only run when needed to get cross-references right. See TexFile.compile_to_pdf.
+        """
+        self._render_tex()
+
         if compile_to_pdf:
-            self.output_file.compile_to_pdf()
+            self.output_file.compile_to_pdf(skip_unchanged, self.collect_data_files(), format_cache, max_passes)
 
             if show_pdf:
                 open_file_with_default_program(self.output_file.filename, self.output_file.filepath)
+
+    async def render_async(self,
+                           compile_to_pdf=True,
+                           show_pdf=True,
+                           skip_unchanged=False,
+                           format_cache=None,
+                           max_passes=1):
+        """
+        Asynchronous version of 'render' for asyncio applications. The files are read and written in the default executor of the event loop and pdflatex is run in an asyncio subprocess, so that the event loop is never blocked.
+
+        Args:
+            See 'render'.
+        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, copy_context().run, self._render_tex)
+
+        if compile_to_pdf:
+            await self.output_file.compile_to_pdf_async(skip_unchanged,
+                                                        self.collect_data_files(),
+                                                        format_cache,
+                                                        max_passes)
+
+            if show_pdf:
+                await loop.run_in_executor(None,
+                                           open_file_with_default_program,
+                                           self.output_file.filename,
+                                           self.output_file.filepath)
@@ -1,14 +1,41 @@
 import os
-from subprocess import DEVNULL, STDOUT, check_call
+import re
+import json
+import hashlib
+import asyncio
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from subprocess import DEVNULL, STDOUT, call
+from time import perf_counter
+
+from python2latex.traversal import walk, LEAVE
+from python2latex.profiler import profile_operation
+from python2latex.utils import hash_file, write_if_changed
+from python2latex.latex_log import LatexError, parse_log
+
+
+# Collector of the requirements of the objects being built (see '_Requirements'), if any.
+_active_requirements = ContextVar('python2latex_requirements', default=None)
+
+# TexFile of the document being built, if any. The figures compiled while building use its engines and build directory.
+_building_file = ContextVar('python2latex_building_file', default=None)
 
 
 def build(obj, parent=None):
     """
     Safely builds the object by calling its method 'build' only if 'obj' is not a string. If a parent is passed, all
     packages and preamble lines needed to the object will be added to the packages and preamble of the parent.
+
+    If requirements are being collected (see '_Requirements'), the object is added to them if it needs packages or
+    preamble lines.
     """
     if isinstance(obj, TexObject):
         built_obj = obj.build()
+        if obj._packages or obj._preamble:
+            requirements = _active_requirements.get()
+            if requirements is not None:
+                requirements.add(obj)
         if parent:
             for package_name, package in obj.packages.items():
                 parent.add_package(package_name, *package.options, **package.kwoptions)
@@ -19,31 +46,270 @@ def build(obj, parent=None):
         return str(obj)
 
 
+def write_parts(stream, parts):
+    """
+    Writes the parts yielded by 'iter_build' to the file-like object 'stream', separated by new lines. Only one part
+    is held in memory at a time.
+
+    Args:
+        stream (file-like object): Text stream with a 'write' method.
+        parts (Iterable[str]): Parts of tex to write.
+    """
+    separator = ''
+    for part in parts:
+        stream.write(separator)
+        stream.write(part)
+        separator = '\n'
+
+
+def _advance(steps, return_code=None):
+    """
+    Sends the return code of the last command to the generator 'steps'. Returns a tuple (done, value), where 'value' is
+    the next command if 'done' is False, and the value returned by the generator otherwise.
+    """
+    try:
+        return False, steps.send(return_code)
+    except StopIteration as stop:
+        return True, stop.value
+
+
+def _run_steps(steps):
+    """
+    Runs the commands yielded by the generator 'steps' as subprocesses and returns the value returned by the generator.
+    """
+    done, value = _advance(steps)
+    while not done:
+        command, cwd = value
+        done, value = _advance(steps, call(command, cwd=cwd, stdout=DEVNULL, stderr=STDOUT))
+    return value
+
+
+async def _run_steps_async(steps):
+    """
+    Same as '_run_steps', but the commands are run in asyncio subprocesses and the generator is advanced in the default
+    executor of the event loop, since it does file operations. The generator runs in the context of the caller, so that
+    its active profiler records the operations.
+    """
+    loop = asyncio.get_running_loop()
+    context = copy_context()
+    done, value = await loop.run_in_executor(None, context.run, _advance, steps)
+    while not done:
+        command, cwd = value
+        process = await asyncio.create_subprocess_exec(*command, cwd=cwd, stdout=DEVNULL, stderr=STDOUT)
+        done, value = await loop.run_in_executor(None, context.run, _advance, steps, await process.wait())
+    return value
+
+
+_rerun_pattern = re.compile(r'Rerun to get|Please rerun|rerun LaTeX', re.IGNORECASE)
+
+
+def _read_log(log_path):
+    """
+    Returns the content of a LaTeX log, or an empty string if there is none. Logs are not always valid utf8.
+    """
+    try:
+        with open(log_path, 'r', encoding='utf8', errors='replace') as file:
+            return file.read()
+    except OSError:
+        return ''
+
+
 class TexFile:
     """
     Class that compiles python to tex code. Manages write/read tex.
     """
-    def __init__(self, filename, filepath):
+    def __init__(self, filename, filepath, engine='pdflatex', fallback_engine=None, build_directory=None):
+        """
+        Args:
+            filename (str): Name of the file without extension.
+            filepath (str): Path of the file.
+            engine (str): TeX engine used to compile, like 'pdflatex', 'lualatex' or 'xelatex'.
+            fallback_engine (str or None): If not None, engine with which the compilation is retried when 'engine'
+            runs out of memory ('TeX capacity exceeded'). 'lualatex' allocates its memory dynamically and can compile
+            large plots which exceed the memory of pdflatex.
+            build_directory (BuildDirectory or None): If not None, the file is compiled in a scratch directory given
+            by 'build_directory' and only the pdf is copied to 'filepath'. Otherwise, the auxiliary files are written
+            in 'filepath'.
+        """
         self.filename = filename
         self.filepath = filepath
+        self.engine = engine
+        self.fallback_engine = fallback_engine
+        self.build_directory = build_directory
+        self.log = None  # LatexLog of the last compilation
 
     @property
     def path(self):
         return os.path.join(self.filepath, self.filename + '.tex')
 
+    @property
+    def pdf_path(self):
+        return os.path.join(self.filepath, self.filename + '.pdf')
+
+    @property
+    def aux_path(self):
+        return os.path.join(self.filepath, self.filename + '.aux')
+
+    @property
+    def log_path(self):
+        return os.path.join(self.filepath, self.filename + '.log')
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.filepath, self.filename + '.manifest.json')
+
     def save(self, tex):
+        """
+        Saves the tex to the file. The file is replaced atomically and is not rewritten if its content is unchanged,
+        which preserves its modification time.
+        """
         os.makedirs(self.filepath, exist_ok=True)
-        with open(self.path, 'w', encoding='utf8') as file:
+        with write_if_changed(self.path, encoding='utf8') as file:
             file.write(tex)
 
-    def compile_to_pdf(self):
-        # os.chdir(self.filepath)
-        check_call([
-            'pdflatex', '-halt-on-error', '--output-directory', self.filepath,
-            self.filepath + '/' + self.filename + '.tex'
-        ],
-                   stdout=DEVNULL,
-                   stderr=STDOUT)
+    def compile_to_pdf(self, skip_unchanged=False, data_files=(), format_cache=None, max_passes=1):
+        """
+        Compiles the tex file to pdf with the engine of the file (pdflatex by default).
+
+        Args:
+            skip_unchanged (bool): If True, a manifest of the hashes of the tex file and of the data files is saved
+            next to the pdf after compiling. The next compilations are skipped if the pdf exists and the hashes did not
+            change. Note that files included by the tex other than 'data_files', like images, are not checked.
+            data_files (Iterable[str]): Paths of the files read when compiling, like the csv files of plots.
+            format_cache (str or None): If not None, path of a directory where the preamble of the tex file is dumped
+            into a precompiled format file, keyed by the hash of the preamble. The compilations of files with the same
+            preamble then load this format instead of parsing the preamble again, which is much faster for small
+            documents. Requires the LaTeX package 'mylatexformat'.
+            max_passes (int): Maximum number of times pdflatex is run. Another pass is only run when the .aux file
+            changed during the last pass or when the log asks to rerun, for example to get cross-references right.
+
+        The log of the last pass is parsed into the 'log' attribute, a LatexLog giving the errors, warnings, bad boxes,
+        memory used by TeX, number of pages and wall time of the compilation. If pdflatex fails, a LatexError, a
+        subclass of CalledProcessError, is raised with the parsed log in its 'log' attribute.
+
+        Returns True if the file was compiled, False if the compilation was skipped.
+        """
+        return _run_steps(self._compile_steps(skip_unchanged, data_files, format_cache, max_passes))
+
+    async def compile_to_pdf_async(self, skip_unchanged=False, data_files=(), format_cache=None, max_passes=1):
+        """
+        Same as 'compile_to_pdf', but pdflatex is run in an asyncio subprocess and the file operations are done in the
+        default executor of the event loop, so that the loop is never blocked.
+        """
+        return await _run_steps_async(self._compile_steps(skip_unchanged, data_files, format_cache, max_passes))
+
+    def _compile_steps(self, skip_unchanged, data_files, format_cache, max_passes):
+        """
+        Generator doing the compilation, shared by the synchronous and asynchronous APIs. It yields the commands to run
+        as tuples (command, cwd) and receives their return codes. See '_run_steps'.
+        """
+        if skip_unchanged:
+            manifest = self._build_manifest(data_files)
+            if manifest == self._load_manifest() and os.path.exists(self.pdf_path):
+                return False
+
+        # The manifest of the last compilation is removed before running the engine, which may overwrite the pdf, and
+        # is only written again if the compilation succeeds.
+        if os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
+        if self.build_directory is None:
+            yield from self._engines_steps(self.filepath, format_cache, max_passes)
+        else:
+            with self.build_directory.scratch_directory(self) as output_directory:
+                yield from self._engines_steps(output_directory, format_cache, max_passes)
+                self.build_directory.copy_back(os.path.join(output_directory, self.filename + '.pdf'), self.pdf_path)
+
+        if skip_unchanged:
+            with write_if_changed(self.manifest_path, encoding='utf8') as file:
+                json.dump(manifest, file, indent=2)
+        return True
+
+    def _engines_steps(self, output_directory, format_cache, max_passes):
+        """
+        Runs the passes of the engine, writing the pdf and the auxiliary files in 'output_directory', and falls back on
+        the fallback engine if the engine runs out of memory.
+        """
+        engines = [self.engine]
+        if self.fallback_engine is not None and self.fallback_engine != self.engine:
+            engines.append(self.fallback_engine)
+        aux_path = os.path.join(output_directory, self.filename + '.aux')
+        log_path = os.path.join(output_directory, self.filename + '.log')
+
+        # No os.chdir: the tex file is compiled from the current working directory.
+        start = perf_counter()
+        for engine in engines:
+            command = [engine, '-halt-on-error']
+            if format_cache is not None:
+                format_path = yield from self._preamble_format_steps(format_cache, engine)
+                command.append('-fmt=' + format_path)
+            command += ['--output-directory', output_directory, self.filepath + '/' + self.filename + '.tex']
+
+            for passes in range(1, max_passes + 1):
+                aux_hash = hash_file(aux_path)
+                with profile_operation('TexFile.compile_to_pdf', self.filename):
+                    return_code = yield command, None
+                log_text = _read_log(log_path)
+                self.log = parse_log(log_text)
+                self.log.time = perf_counter() - start
+                self.log.passes = passes
+                self.log.engine = engine
+                if return_code or not self._needs_rerun(aux_path, aux_hash, log_text):
+                    break
+
+            if not return_code:
+                return
+            if not self.log.capacity_exceeded or engine == engines[-1]:
+                raise LatexError(return_code, command, self.log)
+
+    def _needs_rerun(self, aux_path, previous_aux_hash, log_text):
+        """
+        Returns True if the .aux file existed and changed during the last pass, or if the log asks to rerun LaTeX.
+        """
+        if previous_aux_hash is not None and hash_file(aux_path) != previous_aux_hash:
+            return True
+        return _rerun_pattern.search(log_text) is not None
+
+    def _preamble_format_steps(self, format_cache, engine):
+        """
+        Returns the absolute path, without extension, of the format file of the preamble of the tex file for 'engine'
+        in the directory 'format_cache'. The format is dumped with mylatexformat first if it is not already cached.
+        """
+        with open(self.path, 'r', encoding='utf8') as file:
+            preamble = file.read().split(r'\begin{document}', 1)[0]
+        format_name = f'{engine}-' + hashlib.sha256(preamble.encode('utf8')).hexdigest()[:16]
+        format_path = os.path.abspath(os.path.join(format_cache, format_name))
+
+        if not os.path.exists(format_path + '.fmt'):
+            os.makedirs(format_cache, exist_ok=True)
+            with write_if_changed(format_path + '.tex', encoding='utf8') as file:
+                file.write(preamble + '\\begin{document}\n\\end{document}\n')
+            # The format is dumped under a unique name, then renamed, so that concurrent compilations never load a
+            # partially written format.
+            job_name = f'{format_name}-{uuid.uuid4().hex[:8]}'
+            command = [engine, '-ini', '-halt-on-error', f'-jobname={job_name}', f'&{engine}', 'mylatexformat.ltx',
+                       format_name + '.tex']
+            with profile_operation('TexFile.dump_format', format_name):
+                return_code = yield command, format_cache
+            if return_code:
+                format_log = parse_log(_read_log(os.path.join(format_cache, job_name + '.log')))
+                raise LatexError(return_code, command, format_log)
+            os.replace(os.path.join(format_cache, job_name + '.fmt'), format_path + '.fmt')
+
+        return format_path
+
+    def _build_manifest(self, data_files):
+        return {
+            'engine': self.engine,
+            'tex': hash_file(self.path),
+            'data_files': {path: hash_file(path) for path in sorted(set(data_files))},
+        }
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
 
 
 class TexObject:
@@ -51,7 +317,12 @@ class TexObject:
     Implements an abstract Tex object.
     Provides a 'add_package' method to add packages needed for this object.
     Inherited classes should redefine the 'build' method.
+
+    Uses __slots__ so that small objects, which can be created by millions in large documents, do not carry a __dict__.
+    The packages and the preamble are only allocated when first used.
     """
+    __slots__ = ('name', '_packages', '_preamble', '_build_cache', '_parents')
+
     def __init__(self, obj_name):
         """
         Args:
@@ -59,8 +330,30 @@ class TexObject:
         """
         self.name = obj_name
 
-        self.packages = {}
-        self.preamble = []
+        self._packages = None
+        self._preamble = None
+        self._build_cache = None  # Entries of the last incremental build, discarded by 'invalidate'.
+        self._parents = ()  # Objects whose cached builds contain this object.
+
+    @property
+    def packages(self):
+        if self._packages is None:
+            self._packages = {}
+        return self._packages
+
+    @packages.setter
+    def packages(self, packages):
+        self._packages = packages
+
+    @property
+    def preamble(self):
+        if self._preamble is None:
+            self._preamble = []
+        return self._preamble
+
+    @preamble.setter
+    def preamble(self, preamble):
+        self._preamble = preamble
 
     def add_package(self, package, *options, **kwoptions):
         """
@@ -74,26 +367,116 @@ class TexObject:
         if not package in self.packages:
             self.packages[package] = Package(package, *options, **kwoptions)
         else:
-            options = set(options) | set(self.packages[package].options)
+            # Options are merged in order of first appearance, so that the tex does not change between runs.
+            options = dict.fromkeys((*self.packages[package].options, *options))
             self.packages[package].options = tuple(options)
             self.packages[package].kwoptions.update(kwoptions)
+        self.invalidate()
 
     def add_to_preamble(self, tex_object_or_string):
         self.preamble.append(tex_object_or_string)
+        self.invalidate()
 
-    def build_preamble(self):
-        packages = self.build_packages()
-        preamble = dict((build(line, self), '')
-                        for line in self.preamble)  # Removes duplicate while keeping order
-        preamble = '\n'.join([packages] + list(preamble.keys()))
+    def invalidate(self):
+        """
+        Discards the cached result of incremental builds for this object and for every object containing it, so that
+        the next incremental build rebuilds them. Methods that modify objects, as well as in place modifications of the
+        options and keyword options of environments, call it automatically. It should be called manually after
+        modifying other attributes in place, such as 'env.body' or 'table.data'.
+        """
+        stack = [self]
+        while stack:
+            obj = stack.pop()
+            if obj._build_cache is not None:
+                obj._build_cache = None
+            stack.extend(obj._parents)
+
+    def _add_parent(self, parent):
+        """
+        Registers 'parent' as containing this object, so that invalidating this object also invalidates 'parent'.
+        """
+        if not any(obj is parent for obj in self._parents):
+            self._parents += (parent, )
+
+    def __getstate__(self):
+        """
+        Pickles the attributes of the object, whether they are slots or not. The cache of incremental builds and the
+        links to the parents are not pickled, so that pickling an object does not pickle the whole document with it.
+        """
+        state = {name: getattr(self, name) for cls in type(self).__mro__ for name in getattr(cls, '__slots__', ())
+                 if hasattr(self, name)}
+        state.update(getattr(self, '__dict__', {}))
+        state['_build_cache'] = None
+        state['_parents'] = ()
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
+    def _children(self):
+        """
+        Returns the TexObjects nested inside this object, which can need packages or preamble lines of their own.
+        Inherited classes that hold other TexObjects should redefine this method.
+        """
+        return ()
+
+    def collect_requirements(self):
+        """
+        Collects, in a single pass over the tree of nested objects, the packages and the preamble lines needed by this
+        object and every object nested inside it. The packages and preamble of the objects are left unchanged.
+
+        Returns a tuple (packages, preamble), where 'packages' is a dict of Package objects with merged options and
+        'preamble' is a list of built preamble lines without duplicates. Both are in order of first appearance.
+        """
+        requirements = TexObject('requirements')
+        preamble = {}  # Removes duplicates while keeping order
+        expand = lambda node: node._children() if isinstance(node, TexObject) else None
+        for event, node, _ in walk(self, expand):
+            if event == LEAVE or not isinstance(node, TexObject):
+                continue
+            if node._packages:
+                for package_name, package in node._packages.items():
+                    requirements.add_package(package_name, *package.options, **package.kwoptions)
+            if node._preamble:
+                for line in node._preamble:
+                    preamble[build(line)] = None
+
+        return requirements.packages, list(preamble)
+
+    def _data_files(self):
+        """
+        Returns the paths of the files written by this object and read by LaTeX when compiling, like the csv files of
+        plots. Inherited classes that write such files should redefine this method. When requirements are collected
+        while building, objects built as a whole are only collected if they also have packages, like plots.
+        """
+        return ()
+
+    def collect_data_files(self):
+        """
+        Returns the list of the paths of the data files (see '_data_files') of this object and every object nested
+        inside it, in order of first appearance and without duplicates.
+        """
+        data_files = {}
+        expand = lambda node: node._children() if isinstance(node, TexObject) else None
+        for event, node, _ in walk(self, expand):
+            if event != LEAVE and isinstance(node, TexObject):
+                for path in node._data_files():
+                    data_files[path] = None
+        return list(data_files)
 
-        return preamble
+    def build_preamble(self):
+        packages, preamble = self.collect_requirements()
+        packages = '\n'.join([build(package) for package in packages.values()])
+        return '\n'.join([packages] + preamble)
 
     def build_packages(self):
-        return '\n'.join([build(package, self) for package in self.packages.values()])
+        packages, _ = self.collect_requirements()
+        return '\n'.join([build(package) for package in packages.values()])
 
     def __repr__(self):
-        class_name = self.__name__ if '__name__' in self.__dict__ else self.__class__.__name__
+        instance_dict = getattr(self, '__dict__', {})
+        class_name = instance_dict['__name__'] if '__name__' in instance_dict else self.__class__.__name__
         return f'{class_name} {self.name}'
 
     def __str__(self):
@@ -105,8 +488,86 @@ class TexObject:
         """
         return ''
 
+    def iter_build(self):
+        """
+        Builds the object part by part. Joining the yielded parts with new lines gives the same string as 'build'.
+        Empty parts are never yielded.
+
+        Yields the non-empty .tex strings of the object.
+        """
+        tex = self.build()
+        if tex:
+            yield tex
+
+
+class _Requirements:
+    """
+    Packages, preamble lines and data files of the objects built while it is active, collected in the same pass as the
+    building instead of walking the tree of objects again afterwards. Environments add themselves when they are
+    expanded and the other objects are added by 'build'.
+
+    Usage example:
+    >>> requirements = _Requirements()
+    >>> with requirements.collecting():
+    ...     tex = env.build()
+    >>> preamble = requirements.build_preamble()
+    """
+    __slots__ = ('_holder', 'preamble', 'data_files')
+
+    def __init__(self):
+        self._holder = TexObject('requirements')  # Merges the options of the packages like 'add_package' does.
+        self.preamble = {}  # Built lines, without duplicates and in order of first appearance.
+        self.data_files = {}
+
+    @property
+    def packages(self):
+        return self._holder.packages
+
+    @contextmanager
+    def collecting(self):
+        """
+        Collects the requirements of the objects built in the 'with' block, in the current thread or asyncio task.
+        """
+        token = _active_requirements.set(self)
+        try:
+            yield self
+        finally:
+            _active_requirements.reset(token)
+
+    def add(self, obj):
+        """
+        Adds the packages, preamble lines and data files of the object itself, not of the objects nested inside it.
+        """
+        if obj._packages:
+            for package_name, package in obj._packages.items():
+                self._holder.add_package(package_name, *package.options, **package.kwoptions)
+        if obj._preamble:
+            for line in obj._preamble:
+                self.preamble[build(line)] = None
+        for path in obj._data_files():
+            self.data_files[path] = None
+
+    def update(self, other):
+        """
+        Adds the requirements collected by another '_Requirements', like those collected in a worker process.
+        """
+        for package_name, package in other.packages.items():
+            self._holder.add_package(package_name, *package.options, **package.kwoptions)
+        self.preamble.update(other.preamble)
+        self.data_files.update(other.data_files)
+
+    def build_preamble(self):
+        packages = '\n'.join([build(package) for package in self.packages.values()])
+        return '\n'.join([packages] + list(self.preamble))
+
+
+def _has_requirements(obj):
+    return bool(obj._packages or obj._preamble or obj._data_files())
+
 
 class TexCommand(TexObject):
+    __slots__ = ('command', 'options', 'parameters', 'kwoptions', 'options_pos')
+
     def __init__(self, command, *parameters, options=list(), options_pos='second', **kwoptions):
         r"""
         Args:
@@ -126,39 +587,53 @@ class TexCommand(TexObject):
         self.options_pos = options_pos
 
     def build(self):
+        return self._build_command(self.options, self.kwoptions)
+
+    def _build_command(self, options, kwoptions):
+        """
+        Builds the command with the given options instead of the options of the object, so that inherited classes can
+        add options when building without modifying the object.
+        """
         command = f'\\{self.command}'
-        options = ''
 
-        if self.options or self.kwoptions:
-            kwoptions = ', '.join('='.join((build(key, self).replace('_', ' '), build(value, self)))
-                                  for key, value in self.kwoptions.items())
-            options = ', '.join([build(opt, self) for opt in self.options])
+        if options or kwoptions:
+            kwoptions = ', '.join('='.join((build(key).replace('_', ' '), build(value)))
+                                  for key, value in kwoptions.items())
+            options = ', '.join([build(opt) for opt in options])
             if kwoptions and options:
                 options += ', '
             options = f'[{options}{kwoptions}]'
+        else:
+            options = ''
 
         if self.options_pos == 'first':
             command += options
             if self.parameters:
-                command += f"{{{'}{'.join([build(param, self) for param in self.parameters])}}}"
+                command += f"{{{'}{'.join([build(param) for param in self.parameters])}}}"
         if self.options_pos == 'second':
             if self.parameters:
-                command += f'{{{build(self.parameters[0], self)}}}'
+                command += f'{{{build(self.parameters[0])}}}'
             command += options
             if len(self.parameters) > 1:
-                command += f"{{{'}{'.join([build(param, self) for param in self.parameters[1:]])}}}"
+                command += f"{{{'}{'.join([build(param) for param in self.parameters[1:]])}}}"
         elif self.options_pos == 'last':
             if self.parameters:
-                command += f"{{{'}{'.join([build(param, self) for param in self.parameters])}}}"
+                command += f"{{{'}{'.join([build(param) for param in self.parameters])}}}"
             command += options
 
         return command
 
+    def _children(self):
+        return [obj for obj in (*self.options, *self.parameters, *self.kwoptions.keys(), *self.kwoptions.values())
+                if isinstance(obj, TexObject)]
+
 
 class Package(TexCommand):
     """
     'usepackage' tex command wrapper.
     """
+    __slots__ = ()
+
     def __init__(self, package_name, *options, **kwoptions):
         super().__init__('usepackage',
                          package_name,
@@ -171,6 +646,8 @@ class bold(TexCommand):
     r"""
     Applies \textbf{...} command on text.
     """
+    __slots__ = ()
+
     def __init__(self, text):
         """
         Args:
@@ -183,6 +660,8 @@ class italic(TexCommand):
     r"""
     Applies \textit{...} command on text.
     """
+    __slots__ = ()
+
     def __init__(self, text):
         """
         Args:
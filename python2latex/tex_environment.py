@@ -1,12 +1,18 @@
 from functools import wraps
+from time import perf_counter
 
 from python2latex import TexObject, TexCommand, build
+from python2latex.tex_base import _active_requirements, _has_requirements
+from python2latex.traversal import walk, ENTER, LEAVE
+from python2latex.profiler import BuildProfiler
 
 
 class begin(TexCommand):
     """
     'begin' tex command wrapper.
     """
+    __slots__ = ()
+
     def __init__(self, environment, *parameters, options=list(), options_pos='second', **kwoptions):
         super().__init__('begin',
                          environment,
@@ -20,6 +26,8 @@ class end(TexCommand):
     """
     'end' tex command wrapper.
     """
+    __slots__ = ()
+
     def __init__(self, environment):
         super().__init__('end', environment)
 
@@ -28,6 +36,8 @@ class Label(TexCommand):
     """
     'label' tex command wrapper.
     """
+    __slots__ = ('label', 'prefix')
+
     def __init__(self, label, prefix=None):
         self.label = label
         self.prefix = prefix
@@ -42,6 +52,52 @@ class Label(TexCommand):
             return ''
 
 
+class _InvalidatingList(list):
+    """
+    List of options of an environment which invalidates the environment when modified in place, so that incremental
+    builds are not stale.
+    """
+    __slots__ = ('owner', )
+
+    def __init__(self, iterable, owner):
+        super().__init__(iterable)
+        self.owner = owner
+
+    def __reduce__(self):
+        return type(self), (list(self), self.owner)
+
+
+class _InvalidatingDict(dict):
+    """
+    Dict of keyword options of an environment which invalidates the environment when modified in place, so that
+    incremental builds are not stale.
+    """
+    __slots__ = ('owner', )
+
+    def __init__(self, mapping, owner):
+        super().__init__(mapping)
+        self.owner = owner
+
+    def __reduce__(self):
+        return type(self), (dict(self), self.owner)
+
+
+def _invalidating(method):
+    @wraps(method)
+    def invalidating_method(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        self.owner.invalidate()
+        return result
+    return invalidating_method
+
+
+for _name in ('__setitem__', '__delitem__', '__iadd__', '__imul__', 'append', 'extend', 'insert', 'pop', 'remove',
+              'clear', 'sort', 'reverse'):
+    setattr(_InvalidatingList, _name, _invalidating(getattr(list, _name)))
+for _name in ('__setitem__', '__delitem__', 'pop', 'popitem', 'clear', 'update', 'setdefault'):
+    setattr(_InvalidatingDict, _name, _invalidating(getattr(dict, _name)))
+
+
 class TexEnvironment(TexObject):
     r"""
     Implements a basic TexEnvironment as
@@ -74,17 +130,42 @@ class TexEnvironment(TexObject):
         if star_env:
             env_name += '*'
         self.head = begin(env_name, *parameters, options=options, **kwoptions)
+        self.head.options = _InvalidatingList(self.head.options, self)
+        self.head.kwoptions = _InvalidatingDict(self.head.kwoptions, self)
         self.tail = end(env_name)
         self.body = []
 
-        self.parameters = self.head.parameters
-        self.options = self.head.options
-        self.kwoptions = self.head.kwoptions
-
         self.label_pos = label_pos
         self._label = Label(label, env_name)
         self.label = self._label.label
 
+    @property
+    def parameters(self):
+        return self.head.parameters
+
+    @parameters.setter
+    def parameters(self, value):
+        self.head.parameters = value
+        self.invalidate()
+
+    @property
+    def options(self):
+        return self.head.options
+
+    @options.setter
+    def options(self, value):
+        self.head.options = _InvalidatingList(value, self)
+        self.invalidate()
+
+    @property
+    def kwoptions(self):
+        return self.head.kwoptions
+
+    @kwoptions.setter
+    def kwoptions(self, value):
+        self.head.kwoptions = _InvalidatingDict(value, self)
+        self.invalidate()
+
     def add_text(self, text):
         """
         Adds text (or a tex command) as a string or another TexObject to be appended.
@@ -102,6 +183,7 @@ class TexEnvironment(TexObject):
             text (Union[str, TexObject]): Text to add.
         """
         self.body.append(text)
+        self.invalidate()
 
     def __iadd__(self, other):
         self.append(other)
@@ -115,7 +197,7 @@ class TexEnvironment(TexObject):
 
         Returns obj.
         """
-        self.body.append(obj)
+        self.append(obj)
         return obj
 
     def __contains__(self, value):
@@ -159,23 +241,245 @@ class TexEnvironment(TexObject):
                             f"Everything else is identical.\n\n" + str(cls_to_bind.__doc__)
         return BindedCls
 
-    def build(self):
+    def _build_parts(self):
         """
-        Builds recursively the environments of the body and converts it to .tex.
-        Returns the .tex string of the file.
+        Returns the list of parts (strings or TexObjects) of the environment in the order they should be built.
+        Inherited classes that need to preprocess their content before building should redefine this method.
         """
         tex = [self.head]
 
         if self.label_pos == 'top':
             tex.append(self._label)
 
-        tex.extend(self.body)
+        tex.extend(self._build_body())
 
         if self.label_pos == 'bottom':
             tex.append(self._label)
 
         tex.append(self.tail)
 
-        tex = [build(part, self) for part in tex]
+        return tex
+
+    def _build_body(self):
+        """
+        Returns the list of parts of the body to build. Inherited classes that add content to the body when building
+        should redefine this method and return a new list instead of modifying 'self.body', so that building has no
+        side effects and can be repeated.
+        """
+        return self.body
+
+    def _children(self):
+        return [self.head, self._label, *self.body, self.tail]
+
+    def iter_build(self, incremental=False):
+        """
+        Builds the environments of the body and yields the .tex parts one by one, without ever holding the whole .tex
+        string in memory. Joining the parts with new lines gives the same string as 'build'.
+
+        Nested environments are traversed with an explicit stack, so the depth of the document is not limited by the
+        recursion limit of Python.
+
+        Args:
+            incremental (bool): If True, the parts of every environment are cached and reused by the next incremental
+            builds until the environment or something inside it is modified (see 'invalidate'). Only the modified
+            branches are then rebuilt. Note that the whole output is then kept in memory.
+
+        If requirements are being collected (see 'tex_base._Requirements'), the packages, preamble lines and data files
+        of the objects are collected while building them.
+        """
+        profiler = BuildProfiler.current()
+        requirements = _active_requirements.get()
+        if incremental or profiler is not None:
+            yield from self._iter_build_tracked(incremental, profiler, requirements)
+            return
+
+        # Same traversal as 'traversal.walk', inlined since it is the hot path of every build: the parts of nested
+        # streamable environments are expanded with an explicit stack of iterators and the other parts are built.
+        stack = [iter(self._build_parts())]
+        if requirements is not None:
+            requirements.add(self)
+        while stack:
+            for part in stack[-1]:
+                cls = type(part)
+                if cls is str:
+                    if part:
+                        yield part
+                    continue
+                streamable = _streamable_classes.get(cls)
+                if streamable is None:
+                    streamable = _streamable_classes[cls] = _is_streamable_class(cls)
+                if streamable:
+                    stack.append(iter(part._build_parts()))
+                    if requirements is not None:
+                        requirements.add(part)
+                    break
+                if isinstance(part, TexObject):
+                    tex = part.build()
+                    if requirements is not None and (part._packages or part._preamble):
+                        requirements.add(part)
+                else:
+                    tex = str(part)
+                if tex:
+                    yield tex
+            else:
+                stack.pop()
+
+    def _iter_build_tracked(self, incremental, profiler, requirements):
+        """
+        Variant of 'iter_build' which caches the parts of the environments if 'incremental' is True and records the
+        build in 'profiler' if it is not None. The objects with requirements are added to 'requirements' if it is not
+        None.
+        """
+        if incremental and self._build_cache is not None:
+            yield from _iter_cache(self, requirements)
+            return
+
+        expanded_at = None
+        expanded_required = ()  # Objects with requirements built while expanding the last expanded environment.
+
+        def expand(node):
+            nonlocal expanded_at, expanded_required
+            if node is self or (_is_streamable(node) and not (incremental and node._build_cache is not None)):
+                expanded_at = perf_counter()
+                if incremental:
+                    parts, expanded_required = _gather_requirements(node._build_parts)
+                    return parts
+                return node._build_parts()
+            return None  # Cached environments are treated as leaves.
+
+        # The cache of an environment holds its own parts of tex and references to the nested environments, whose
+        # parts are in their own caches, so that each part is stored once whatever the depth of the tree. It also holds
+        # the objects with requirements built directly inside the environment, which are collected again when the
+        # cache is reused.
+        entries = []  # Entries of the caches of the environments being built, from the root to the current one.
+        required = []  # Objects with requirements of the environments being built.
+        n_bytes = 0
+        paused = 0.  # Time spent by the caller between parts, which is excluded from the profile.
+        starts = []
+        for event, node, parent in walk(self, expand):
+            if incremental and parent is not None and isinstance(node, TexObject):
+                node._add_parent(parent)
+
+            if event == ENTER:
+                starts.append((n_bytes, expanded_at, paused))
+                if requirements is not None:
+                    requirements.add(node)
+                if incremental:
+                    entries.append([])
+                    required.append([node] if _has_requirements(node) else [])
+                    required[-1].extend(expanded_required)
+                    if requirements is not None:
+                        for obj in expanded_required:
+                            requirements.add(obj)
+            elif event == LEAVE:
+                start_bytes, start, start_paused = starts.pop()
+                if incremental:
+                    node._build_cache = (tuple(entries.pop()), tuple(required.pop()))
+                    if entries:
+                        entries[-1].append(node)
+                if profiler is not None:
+                    profiler.record_node(node, perf_counter() - start - (paused - start_paused), n_bytes - start_bytes)
+            else:
+                start = perf_counter()
+                if incremental and isinstance(node, TexObject) and node._build_cache is not None:
+                    entries[-1].append(node)
+                    node_parts = _iter_cache(node, requirements)
+                elif incremental:
+                    # The objects with requirements built inside the node are gathered for the cache, then collected.
+                    tex, node_required = _gather_requirements(build, node)
+                    required[-1].extend(node_required)
+                    if requirements is not None:
+                        for obj in node_required:
+                            requirements.add(obj)
+                    node_parts = (tex, ) if tex else ()
+                    if tex:
+                        entries[-1].append(tex)
+                else:
+                    tex = build(node)
+                    node_parts = (tex, ) if tex else ()
+                if profiler is not None:
+                    node_parts = tuple(node_parts)
+                    node_bytes = sum(len(tex.encode('utf8')) for tex in node_parts)
+                    n_bytes += node_bytes
+                    if isinstance(node, TexObject):
+                        profiler.record_node(node, perf_counter() - start, node_bytes)
+
+                for tex in node_parts:
+                    paused_at = perf_counter()
+                    yield tex
+                    paused += perf_counter() - paused_at
+
+    def build(self, incremental=False):
+        """
+        Builds recursively the environments of the body and converts it to .tex.
+        Returns the .tex string of the file.
+
+        Args:
+            incremental (bool): If True, reuses the cached parts of the environments which were not modified since the
+            last incremental build. See 'iter_build'.
+        """
+        return '\n'.join(self.iter_build(incremental))
+
+
+class _RequiredObjects(list):
+    """
+    List of the objects with requirements built inside a part of an environment during an incremental build, with the
+    'add' method of '_Requirements' so that it can collect them in its place.
+    """
+    __slots__ = ()
+    add = list.append
+
+
+def _gather_requirements(function, *args):
+    """
+    Calls 'function' and returns its result with the list of the objects with requirements built during the call.
+    """
+    gathered = _RequiredObjects()
+    token = _active_requirements.set(gathered)
+    try:
+        return function(*args), gathered
+    finally:
+        _active_requirements.reset(token)
+
+
+def _iter_cache(env, requirements=None):
+    """
+    Yields the parts of tex cached by the last incremental build of 'env'. The entries of the caches are either parts
+    of tex or nested environments, whose parts are read from their own caches. The objects with requirements stored in
+    the caches are added to 'requirements' if it is not None.
+    """
+    def enter(cached_env):
+        entries, required = cached_env._build_cache
+        if requirements is not None:
+            for obj in required:
+                requirements.add(obj)
+        return iter(entries)
+
+    stack = [enter(env)]
+    while stack:
+        for entry in stack[-1]:
+            if type(entry) is str:
+                yield entry
+            else:
+                stack.append(enter(entry))
+                break
+        else:
+            stack.pop()
+
+
+_streamable_classes = {}  # Whether instances of a class are streamable, cached by class for the building loops.
+
+
+def _is_streamable_class(cls):
+    """
+    Environments which do not redefine 'build' can be built part by part. Others are built as a whole.
+    """
+    return issubclass(cls, TexEnvironment) and cls.build is TexEnvironment.build
+
 
-        return '\n'.join([part for part in tex if part])
+def _is_streamable(obj):
+    cls = type(obj)
+    streamable = _streamable_classes.get(cls)
+    if streamable is None:
+        streamable = _streamable_classes[cls] = _is_streamable_class(cls)
+    return streamable
@@ -0,0 +1,44 @@
+ENTER = 'enter'
+LEAVE = 'leave'
+LEAF = 'leaf'
+
+
+def walk(root, expand):
+    """
+    Traverses a tree depth first, in order, using an explicit stack instead of recursion. Arbitrarily deep trees can
+    therefore be traversed without reaching the recursion limit of Python, and no Python frame is created per node.
+
+    Usage example:
+    >>> from python2latex import TexEnvironment
+    >>> from python2latex.traversal import walk, LEAF
+    >>> env = TexEnvironment('env')
+    >>> env += 'text'
+    >>> leaves = [node for event, node, parent in walk(env, lambda node: node.body if node is env else None)
+    ...           if event == LEAF]
+    >>> leaves
+    ['text']
+
+    Args:
+        root (Any): Root node of the tree. The root is always expanded.
+        expand (callable): Receives a node and returns the sequence of its children if it should be treated as an
+        inner node, or None if it is a leaf. It is called exactly once per node, just before the node is visited.
+
+    Yields (event, node, parent) tuples, where 'event' is ENTER when entering an inner node (before its children),
+    LEAVE when leaving it (after its children) and LEAF for leaves. 'parent' is None for the root.
+    """
+    children = expand(root)
+    yield ENTER, root, None
+    stack = [(root, iter(children or ()))]
+    while stack:
+        node, children = stack[-1]
+        for child in children:
+            grandchildren = expand(child)
+            if grandchildren is None:
+                yield LEAF, child, node
+            else:
+                yield ENTER, child, node
+                stack.append((child, iter(grandchildren)))
+                break
+        else:
+            stack.pop()
+            yield LEAVE, node, stack[-1][0] if stack else None
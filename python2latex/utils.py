@@ -1,17 +1,80 @@
 import sys
 import os
 import subprocess
+import hashlib
+import filecmp
+import tempfile
+from contextlib import contextmanager
 
 
 def open_file_with_default_program(filename, filepath):
-    cwd = os.getcwd()
+    """
+    Opens the pdf 'filepath/filename.pdf' with the default program of the system. The working directory of the process
+    is left untouched, so it is safe to call from many threads.
+    """
+    path = os.path.abspath(os.path.join(filepath, filename + '.pdf'))
+    if sys.platform.startswith('linux'):
+        open_command = 'xdg-open'
+        subprocess.run([open_command, path])
+    else:
+        open_command = 'start'
+        subprocess.run([open_command, '', path], shell=True)
+
+
+def hash_file(path):
+    """
+    Returns the sha256 hex digest of the content of the file at 'path', or None if the file does not exist.
+    """
+    if not os.path.exists(path):
+        return None
+    sha = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(2**20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+@contextmanager
+def write_if_changed(path, mode='w', **open_kwargs):
+    """
+    Opens a temporary file in the directory of 'path' to be written in the 'with' block. When the block exits, the
+    temporary file replaces the file at 'path' atomically if their contents differ, so that readers never see a
+    partially written file. Otherwise, the temporary file is discarded and the existing file, with its modification
+    time, is left untouched.
+
+    Usage example:
+    >>> with write_if_changed('file.tex', encoding='utf8') as file:
+    ...     file.write(tex)
+
+    Args:
+        path (str): Path of the file to write.
+        mode (str): Mode of the file, either 'w' or 'wb'.
+        open_kwargs: Keyword arguments passed to 'open', like 'encoding' or 'newline'.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                    prefix=f'.{os.path.basename(path)}.',
+                                    suffix='.tmp')
     try:
-        os.chdir(filepath)
-        if sys.platform.startswith('linux'):
-            open_command = 'xdg-open'
-            subprocess.run([open_command, filename + ".pdf"])
+        with open(fd, mode, **open_kwargs) as file:
+            yield file
+        if os.path.exists(path) and filecmp.cmp(tmp_path, path, shallow=False):
+            os.remove(tmp_path)
         else:
-            open_command = 'start'
-            subprocess.run([open_command, filename + ".pdf"], shell=True)
+            os.chmod(tmp_path, os.stat(path).st_mode if os.path.exists(path) else _new_file_mode(tmp_path))
+            os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _new_file_mode(tmp_path):
+    """
+    Returns the mode of a file newly created with 'open', i.e. 0o666 masked by the current umask. The umask can only be
+    read by setting it, which is not thread safe, so an empty file is created next to 'tmp_path' to read its mode.
+    """
+    probe_path = tmp_path + '.mode'
+    os.close(os.open(probe_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666))
+    try:
+        return os.stat(probe_path).st_mode
     finally:
-        os.chdir(cwd)
+        os.remove(probe_path)
@@ -0,0 +1,49 @@
+import os
+import shutil
+
+from python2latex import tex_base
+from python2latex.build_directory import BuildDirectory
+from python2latex.tex_base import TexFile
+
+
+class TestBuildDirectory:
+    def setup(self):
+        self.filepath = './some_build_directory_path'
+        self.root = os.path.join(self.filepath, 'scratch')
+        self.output_directories = []
+
+    def teardown(self):
+        shutil.rmtree(self.filepath)
+
+    def fake_call(self, command, **kwargs):
+        output_directory = command[-2]
+        self.output_directories.append(output_directory)
+        filename = os.path.basename(command[-1])[:-len('.tex')]
+        for extension in ['pdf', 'aux', 'log']:
+            with open(os.path.join(output_directory, f'{filename}.{extension}'), 'w') as file:
+                file.write(extension)
+        return 0
+
+    def test_compile_in_scratch_directory(self, monkeypatch):
+        monkeypatch.setattr(tex_base, 'call', self.fake_call)
+        tex_file = TexFile('file', self.filepath, build_directory=BuildDirectory(self.root))
+        tex_file.save('tex')
+        tex_file.compile_to_pdf()
+        tex_file.compile_to_pdf()
+
+        assert sorted(os.listdir(self.filepath)) == ['file.pdf', 'file.tex', 'scratch']
+        assert os.listdir(self.root) == []
+        first_directory, second_directory = self.output_directories
+        assert os.path.isabs(first_directory) and first_directory != second_directory
+
+    def test_keep_aux_files(self, monkeypatch):
+        monkeypatch.setattr(tex_base, 'call', self.fake_call)
+        build_directory = BuildDirectory(self.root, keep_aux_files=True)
+        tex_files = [TexFile(f'file{i}', self.filepath, build_directory=build_directory) for i in range(2)]
+        for tex_file in tex_files + tex_files:
+            tex_file.save('tex')
+            tex_file.compile_to_pdf()
+
+        assert self.output_directories[0] == self.output_directories[2] != self.output_directories[1]
+        assert sorted(os.listdir(self.output_directories[0])) == ['file0.aux', 'file0.log', 'file0.pdf']
+        assert sorted(os.listdir(self.filepath)) == ['file0.pdf', 'file0.tex', 'file1.pdf', 'file1.tex', 'scratch']
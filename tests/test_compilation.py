@@ -0,0 +1,44 @@
+import os
+import shutil
+from subprocess import CalledProcessError
+
+from python2latex import Document, TexFile, compile_many
+from python2latex import tex_base
+
+
+class TestCompileMany:
+    def setup(self):
+        self.filepath = './some_compilation_path'
+
+    def teardown(self):
+        shutil.rmtree(self.filepath)
+
+    def test_compile_many_collects_failures(self, monkeypatch):
+        def fake_call(command, **kwargs):
+            if command[-1].endswith('doc1.tex'):
+                return 1
+            open(command[-1][:-len('.tex')] + '.pdf', 'w').close()
+            return 0
+
+        monkeypatch.setattr(tex_base, 'call', fake_call)
+        documents = [Document(f'doc{i}', filepath=self.filepath) for i in range(4)]
+        results = compile_many(documents, workers=2)
+
+        assert [result.document for result in results] == documents
+        assert [result.success for result in results] == [True, False, True, True]
+        assert isinstance(results[1].error, CalledProcessError)
+        assert all(result.time >= 0 for result in results)
+        assert os.path.exists(os.path.join(self.filepath, 'doc3.tex'))
+        assert os.path.exists(os.path.join(self.filepath, 'doc3.pdf'))
+
+    def test_compile_many_tex_files_skip_unchanged(self, monkeypatch):
+        def fake_call(command, **kwargs):
+            open(command[-1][:-len('.tex')] + '.pdf', 'w').close()
+            return 0
+
+        monkeypatch.setattr(tex_base, 'call', fake_call)
+        tex_files = [TexFile(f'file{i}', self.filepath) for i in range(3)]
+        for tex_file in tex_files:
+            tex_file.save('tex')
+        assert all(result.compiled for result in compile_many(tex_files, skip_unchanged=True))
+        assert not any(result.compiled for result in compile_many(tex_files, skip_unchanged=True))
@@ -0,0 +1,37 @@
+import numpy as np
+
+from python2latex.decimation import decimate_minmax, decimate_lttb
+
+
+def random_walk(n):
+    return np.arange(n), np.cumsum(np.random.RandomState(42).randn(n))
+
+
+def test_decimate_minmax_keeps_extrema_and_ends():
+    X, Y = random_walk(10000)
+    indices = decimate_minmax(X, Y, 100)
+    assert len(indices) <= 100
+    assert indices[0] == 0 and indices[-1] == 9999
+    assert np.all(np.diff(indices) > 0)
+    assert Y[indices].max() == Y.max() and Y[indices].min() == Y.min()
+
+
+def test_decimate_lttb_keeps_one_point_per_bucket():
+    X, Y = random_walk(10000)
+    indices = decimate_lttb(X, Y, 100)
+    assert len(indices) == 100
+    assert indices[0] == 0 and indices[-1] == 9999
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_decimate_lttb_keeps_spike():
+    X = np.linspace(0, 1, 1000)
+    Y = np.zeros(1000)
+    Y[567] = 10
+    assert 567 in decimate_lttb(X, Y, 20)
+
+
+def test_short_series_are_not_decimated():
+    X, Y = random_walk(10)
+    assert list(decimate_minmax(X, Y, 10)) == list(range(10))
+    assert list(decimate_lttb(X, Y, 20)) == list(range(10))
@@ -1,10 +1,12 @@
+import io
 import os
 import shutil
+import asyncio
 from inspect import cleandoc
 
 from pytest import fixture
 
-from python2latex import TexEnvironment, Document, Section, Subsection
+from python2latex import TexEnvironment, TexCommand, Document, Section, Subsection, Plot, Table
 
 
 @fixture
@@ -72,6 +74,110 @@ class TestDocument:
             \end{section}
             \end{document}''')
 
+    def test_collect_requirements(self):
+        doc = Document('Doc')
+        sec = doc.new_section('Section')
+        sec.add_package('tikz')
+        sub = sec.new_subsection('Subsection')
+        sub.add_package('tikz', 'external')
+        sub.add_to_preamble(r'\usetikzlibrary{arrows}')
+        packages, preamble = doc.collect_requirements()
+        assert list(packages) == ['inputenc', 'geometry', 'tikz']
+        assert packages['tikz'].options == ('external', )
+        assert preamble == [r'\usetikzlibrary{arrows}']
+        assert 'tikz' not in doc.packages
+
+    def test_build_collects_requirements_while_building(self):
+        def colored(value):
+            command = TexCommand('textcolor', 'red', value)
+            command.add_package('xcolor')
+            return command
+
+        doc = Document('Doc')
+        sec = doc.new_section('Section')
+        nested = TexCommand('tikz')
+        nested.add_package('tikz')
+        sec.add_text(TexCommand('command', nested))
+        table = sec.new(Table((1, 2)))
+        table[0, :] = [1, 2]
+        table[0, 0].highlight(colored)
+
+        for incremental in (False, True, True):
+            tex = doc.build(False, False, False, incremental=incremental)
+            assert r'\usepackage{tikz}' in tex
+            assert r'\usepackage{xcolor}' in tex
+            assert tex.index('{inputenc}') < tex.index('{tikz}') < tex.index('{xcolor}')
+        assert 'xcolor' not in doc.packages
+
+    def test_write_to_stream(self):
+        doc = Document('Streamed doc')
+        sec = doc.new_section('Section', label='Section')
+        sec.add_text('Hey')
+        sec.add_package('tikz')
+        stream = io.StringIO()
+        doc.write_to(stream)
+        assert stream.getvalue() == doc.build(False, False, False)
+
+    def test_write_to_file(self):
+        filepath = './some_doc_path/'
+        doc = Document('Streamed doc', filepath=filepath)
+        doc += 'Some text'
+        try:
+            doc.write_to()
+            with open(filepath + 'Streamed doc.tex', encoding='utf8') as file:
+                assert file.read() == doc.build(False, False, False)
+        finally:
+            shutil.rmtree(filepath)
+
+    def test_build_with_workers(self):
+        filepath = './some_parallel_doc_path/'
+        doc = Document('Parallel doc', filepath=filepath)
+        for i in range(3):
+            sec = doc.new_section(f'Section {i}', label=f'sec{i}')
+            sec.add_text(f'Text {i}')
+            sec.new(Plot([1, 2, 3], [i, i, i], plot_name=f'plot{i}', plot_path=filepath))
+        binded_section = doc.bind(Section)
+        binded_section('Binded section').add_text('Built in the main process')
+        doc += 'Some text'
+        try:
+            serial_tex = doc.build(False, False, False)
+            shutil.rmtree(filepath)
+            assert doc.build(False, False, False, workers=2) == serial_tex
+            for i in range(3):
+                assert os.path.exists(filepath + f'plot{i}.csv')
+        finally:
+            shutil.rmtree(filepath)
+
+    def test_collect_data_files(self):
+        doc = Document('Doc')
+        sec = doc.new_section('Section')
+        sec.new(Plot([1, 2], [3, 4], plot_name='plot', plot_path='path'))
+        assert doc.collect_data_files() == [os.path.join('path', 'plot.csv')]
+
+    def test_build_async(self, monkeypatch):
+        filepath = './some_async_doc_path/'
+        commands = []
+
+        class FakeProcess:
+            async def wait(self):
+                return 0
+
+        async def fake_create_subprocess_exec(*command, **kwargs):
+            commands.append(command)
+            return FakeProcess()
+
+        monkeypatch.setattr(asyncio, 'create_subprocess_exec', fake_create_subprocess_exec)
+        doc = Document('Async doc', filepath=filepath)
+        doc.new_section('Section').new(Plot([1, 2], [3, 4], plot_name='plot', plot_path=filepath))
+        try:
+            tex = asyncio.run(doc.build_async(show_pdf=False))
+            assert tex == doc.build(False, False, False)
+            assert os.path.exists(filepath + 'Async doc.tex')
+            assert os.path.exists(filepath + 'plot.csv')
+            assert commands[0][0] == 'pdflatex' and commands[0][-1].endswith('Async doc.tex')
+        finally:
+            shutil.rmtree(filepath)
+
     def test_build_to_other_relative_path(self):
         filepath = './some_doc_path/'
         doc_name = 'Doc name'
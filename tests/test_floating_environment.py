@@ -36,6 +36,12 @@ class Test_FloatingEnvironment:
             \end{with_caption}
             ''')
 
+    def test_floating_environment_build_is_repeatable(self):
+        env = _FloatingEnvironment('repeated', caption='float caption')
+        env.add_text('some text')
+        assert env.build() == env.build()
+        assert env.body == ['some text']
+
 
 class TestFloatingFigure:
     def test_floating_figure_caption_bottom_no_space(self):
@@ -0,0 +1,70 @@
+from inspect import cleandoc
+
+from python2latex.latex_log import LatexError, LogMessage, parse_log
+
+
+successful_log = cleandoc(r"""
+    This is pdfTeX, Version 3.14159265-2.6-1.40.21 (TeX Live 2020) (preloaded format=pdflatex 2020.5.1)
+    LaTeX Warning: Reference `sec1' on page 1 undefined on input line 12.
+
+    Overfull \hbox (15.0pt too wide) in paragraph at lines 14--15
+    []\OT1/cmr/m/n/10 Some very long text|
+
+    Package pgfplots Warning: running in backwards compatibility mode (unsuitable tick labels; missing features). Consider writing \pgfplotsset{compat=1.17} into your preamble.
+     on input line 5.
+
+    LaTeX Font Warning: Font shape `OT1/cmr/bx/sc' undefined
+    (Font)              using `OT1/cmr/bx/n' instead on input line 20.
+
+    LaTeX Warning: Label(s) may have changed. Rerun to get cross-references right.
+
+     )
+    Here is how much of TeX's memory you used:
+     4907 strings out of 478287
+     87669 string characters out of 5849370
+     384658 words of memory out of 5000000
+     20803 multiletter control sequences out of 15000+600000
+     49i,6n,59p,374b,205s stack positions out of 5000i,500n,10000p,200000b,80000s
+    Output written on ./doc.pdf (2 pages, 12345 bytes).
+    PDF statistics:
+    """)
+
+failed_log = cleandoc(r"""
+    This is pdfTeX, Version 3.14159265-2.6-1.40.21 (TeX Live 2020) (preloaded format=pdflatex 2020.5.1)
+    ! TeX capacity exceeded, sorry [main memory size=5000000].
+    \pgfplots@loc@TMPa ...
+
+    l.42 \end{axis}
+
+    No pages of output.
+    """)
+
+
+def test_parse_successful_log():
+    log = parse_log(successful_log)
+    assert log.errors == []
+    assert log.warnings[0] == LogMessage("LaTeX Warning: Reference `sec1' on page 1 undefined on input line 12.", 12)
+    assert log.warnings[2] == LogMessage("LaTeX Font Warning: Font shape `OT1/cmr/bx/sc' undefined", None)
+    assert len(log.warnings) == 4
+    assert log.bad_boxes == [LogMessage(r'Overfull \hbox (15.0pt too wide) in paragraph at lines 14--15', 14)]
+    assert log.memory['words of memory'] == (384658, 5000000)
+    assert log.memory['multiletter control sequences'] == (20803, 615000)
+    assert len(log.memory) == 4
+    assert log.pages == 2
+    assert not log.capacity_exceeded
+    assert log.memory_usage()['strings'] == 4907 / 478287
+
+
+def test_parse_failed_log():
+    log = parse_log(failed_log)
+    assert log.errors == [LogMessage('TeX capacity exceeded, sorry [main memory size=5000000].', 42)]
+    assert log.capacity_exceeded
+    assert log.pages == 0
+    assert log.memory == {}
+
+
+def test_latex_error():
+    error = LatexError(1, ['pdflatex', 'doc.tex'], parse_log(failed_log))
+    assert error.log.capacity_exceeded
+    assert 'TeX capacity exceeded' in str(error)
+    assert LatexError(1, ['pdflatex']).log.errors == []
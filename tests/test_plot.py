@@ -2,6 +2,10 @@ import os
 import shutil
 from inspect import cleandoc
 
+import numpy as np
+import pytest
+
+from python2latex import tex_base
 from python2latex.color import Color
 from python2latex.document import Document
 from python2latex.plot import Plot, LinePlot, MatrixPlot, _Plot
@@ -71,6 +75,35 @@ class TestPlot:
             ''')
         os.remove('plot_test.csv')
 
+    def test_csv_is_read_once_for_all_plots(self):
+        plot = Plot(plot_name='plot_test')
+        for _ in range(3):
+            plot.add_plot([0, 1], [0, 1])
+        tex = plot.build()
+        assert tex.count(r'\pgfplotstableread') == 1
+        assert tex.count('plot_test.csv') == 1
+        assert tex.count(r'{\datatable};') == 3
+        os.remove('plot_test.csv')
+
+    def test_csv_is_read_directly_when_not_shared(self):
+        plot = Plot(plot_name='plot_test')
+        assert r'\pgfplotstableread' not in plot.build()
+        plot.add_plot([0, 1], [0, 1])
+        plot.add_matrix_plot([0, 1], [0, 1], [[1, 2], [3, 4]], raster=True)
+        tex = plot.build()
+        assert r'\pgfplotstableread' not in tex
+        assert 'table[x=x0, y=y0, col sep=comma]{./plot_test.csv};' in tex
+        os.remove('plot_test.csv')
+        os.remove('plot_test.png')
+
+    def test_build_is_repeatable(self):
+        plot = Plot(plot_name='plot_test', caption='Caption')
+        plot.add_plot(list(range(10)), list(range(10)))
+        plot.add_matrix_plot(list(range(2)), list(range(2)), [[1, 2], [3, 4]])
+        first_build = plot.build()
+        assert plot.build() == first_build
+        os.remove('plot_test.csv')
+
     def test_save_csv_to_right_path(self):
         filepath = './some_doc_path/'
         plotpath = filepath + 'plot_path/'
@@ -80,6 +113,60 @@ class TestPlot:
         assert os.path.exists(plotpath + plot_name + '.csv')
         shutil.rmtree(filepath)
 
+    def test_save_csv_pads_shorter_columns(self):
+        plot = Plot(plot_name='plot_test')
+        plot.add_plot([1, 2, 3], [0.5, -1.25, float('nan')])
+        plot.add_plot([1], [10])
+        plot.save_to_csv()
+        with open('plot_test.csv', newline='') as file:
+            assert file.read() == 'x0,y0,x1,y1\r\n1,0.5,1,10\r\n2,-1.25,,\r\n3,nan,,\r\n'
+        os.remove('plot_test.csv')
+
+    def test_save_csv_with_float_format_and_non_finite(self):
+        plot = Plot(plot_name='plot_test', float_format='.3f', non_finite='drop')
+        plot.add_plot([0, 1, 2, 3], [1 / 3, float('nan'), float('inf'), 2 / 3])
+        plot.add_plot([0, 1, 2], [0.1, float('-inf'), 0.3], float_format='.1e', non_finite='mask')
+        tex = plot.build()
+        assert r'\addplot[forget plot, unbounded coords=jump]' in tex
+        with open('plot_test.csv', newline='') as file:
+            assert file.read() == 'x0,y0,x1,y1\r\n0,0.333,0,1.0e-01\r\n3,0.667,1,nan\r\n,,2,3.0e-01\r\n'
+        os.remove('plot_test.csv')
+
+    def test_float_format_with_commas_is_rejected(self):
+        with pytest.raises(ValueError):
+            Plot(float_format=',.2f')
+        with pytest.raises(ValueError):
+            Plot().add_plot([1, 2], [3, 4], float_format=',')
+
+    def test_save_csv_with_max_points(self):
+        plot = Plot(plot_name='plot_test', max_points=10)
+        plot.add_plot(list(range(100)), [i % 7 for i in range(100)])
+        plot.add_plot(list(range(100)), list(range(100)), max_points=None, decimation='lttb')
+        plot.add_plot(list(range(5)), [0, 0, 5, 0, 0], max_points=3, decimation='lttb')
+        plot.save_to_csv()
+        with open('plot_test.csv', newline='') as file:
+            rows = file.read().split('\r\n')[1:-1]
+        assert len(rows) == 10
+        assert [row.split(',')[4:] for row in rows[:3]] == [['0', '0'], ['2', '5'], ['4', '0']]
+        assert rows[3].split(',')[4:] == ['', '']
+        os.remove('plot_test.csv')
+
+    def test_invalid_non_finite_raises(self):
+        with pytest.raises(ValueError):
+            Plot(non_finite='remove')
+        with pytest.raises(ValueError):
+            Plot().add_matrix_plot([0], [0], [[0]], non_finite='drop')
+        with pytest.raises(ValueError):
+            Plot(decimation='every other point')
+        with pytest.raises(ValueError):
+            Plot(max_points=3)
+        with pytest.raises(ValueError):
+            Plot().add_plot([0, 1], [0, 1], max_points=2, decimation='lttb')
+        plot = Plot(plot_name='plot_test')
+        plot.add_plot(list(range(10)), list(range(10)), max_points=3)  # Decimated with the 'minmax' of the Plot
+        with pytest.raises(ValueError):
+            plot.save_to_csv()
+
     def test_build_pdf_to_other_relative_path(self):
         filepath = './some_doc_path/'
         plotpath = filepath + 'plot_path/'
@@ -129,6 +216,81 @@ class TestPlot:
         finally:
             shutil.rmtree('./some_doc_path/')
 
+    def test_externalize(self, monkeypatch):
+        filepath = './some_externalized_plot_path/'
+        compiled = []
+
+        def fake_call(command, **kwargs):
+            compiled.append(command[-1])
+            open(command[-1][:-len('.tex')] + '.pdf', 'w').close()
+            return 0
+
+        monkeypatch.setattr(tex_base, 'call', fake_call)
+        plot = Plot([1, 2, 3], [4, 5, 6], plot_name='plot_test', plot_path=filepath, externalize=filepath + 'figures')
+        try:
+            tex = plot.build()
+            assert r'\begin{tikzpicture}' not in tex
+            assert r'\includegraphics{./some_externalized_plot_path/figures/figure-' in tex
+            assert 'graphicx' in plot.packages
+            assert len(compiled) == 1
+            with open(compiled[0], encoding='utf8') as file:
+                figure_tex = file.read()
+            assert figure_tex.startswith(r'\documentclass{standalone}')
+            assert r'\begin{tikzpicture}' in figure_tex
+
+            assert plot.build() == tex
+            assert len(compiled) == 1  # Reused from the store
+
+            plot.add_plot([1, 2], [3, 3])
+            assert plot.build() != tex
+            assert len(compiled) == 2
+        finally:
+            shutil.rmtree(filepath)
+
+    def test_externalize_uses_engines_of_document(self, monkeypatch):
+        filepath = './some_externalized_plot_path/'
+        engines = []
+
+        def fake_call(command, **kwargs):
+            engines.append(command[0])
+            open(command[-1][:-len('.tex')] + '.pdf', 'w').close()
+            return 0
+
+        monkeypatch.setattr(tex_base, 'call', fake_call)
+        doc = Document('doc', filepath=filepath, engine='lualatex', fallback_engine='xelatex')
+        plot = doc.new(Plot([1, 2, 3], [4, 5, 6], plot_name='plot_test', plot_path=filepath,
+                            externalize=filepath + 'figures'))
+        try:
+            doc.build(save_to_disk=False, compile_to_pdf=False, show_pdf=False)
+            assert engines == ['lualatex']
+            plot.build()
+            assert engines == ['lualatex', 'pdflatex']  # Outside a document, with the default engine
+        finally:
+            shutil.rmtree(filepath)
+
+    def test_externalize_incremental(self, monkeypatch):
+        filepath = './some_externalized_plot_path/'
+
+        def fake_call(command, **kwargs):
+            open(command[-1][:-len('.tex')] + '.pdf', 'w').close()
+            return 0
+
+        monkeypatch.setattr(tex_base, 'call', fake_call)
+        plot = Plot([1, 2, 3], [4, 5, 6], plot_name='plot_test', plot_path=filepath, externalize=filepath + 'figures')
+        try:
+            tex = plot.build(incremental=True)
+            assert plot.build(incremental=True) == tex
+
+            plot.x_label = 'Spam'
+            labeled_tex = plot.build(incremental=True)
+            assert labeled_tex != tex
+
+            plot.axis.kwoptions['xmin'] = -7
+            assert plot.build(incremental=True) != labeled_tex
+            assert plot.build(incremental=True) == plot.build()
+        finally:
+            shutil.rmtree(filepath)
+
 
 class TestLinePlot:
     def teardown(self):
@@ -157,6 +319,23 @@ class TestLinePlot:
         assert l2.id_number == 1
         assert l3.id_number == 2
 
+    def test_arrays_are_not_copied(self):
+        X, Y = np.arange(3), np.ones(3)
+        lineplot = LinePlot(X, Y)
+        assert lineplot.X is X and lineplot.Y is Y
+
+    def test_npy_paths_are_memory_mapped(self, tmp_path):
+        np.save(tmp_path / 'y.npy', np.arange(4.))
+        lineplot = LinePlot(np.arange(4), str(tmp_path / 'y.npy'))
+        assert isinstance(lineplot.Y, np.memmap)
+        assert list(lineplot.Y) == [0, 1, 2, 3]
+
+    def test_invalid_shapes_raise(self):
+        with pytest.raises(ValueError):
+            LinePlot([1, 2, 3], [1, 2])
+        with pytest.raises(ValueError):
+            LinePlot([[1, 2]], [[1, 2]])
+
 
 class TestMatrixPlot:
     def teardown(self):
@@ -168,3 +347,29 @@ class TestMatrixPlot:
         assert lineplot.build() == cleandoc(r"""
             \addplot[matrix plot*, point meta=explicit, mesh/rows=3, mesh/cols=3] table[x=x0, y=y0, meta=z0, col sep=comma]{./some/path/file.csv};
             """)
+
+    def test_invalid_shape_raises(self):
+        with pytest.raises(ValueError):
+            MatrixPlot([1, 2, 3], [4, 5], np.zeros((2, 3)))
+
+    def test_save_memory_mapped_matrix_to_csv(self, tmp_path):
+        Z = np.arange(6.).reshape(3, 2)
+        Z[1, 0] = np.nan
+        np.save(tmp_path / 'z.npy', Z)
+        plot = Plot(plot_name='matrix_plot_test', plot_path=str(tmp_path), non_finite='mask')
+        plot.add_matrix_plot([0., 1., 2.], [0, 1], str(tmp_path / 'z.npy'))
+        plot.save_to_csv()
+        with open(tmp_path / 'matrix_plot_test.csv', newline='') as file:
+            assert file.read().split('\r\n') == ['x0,y0,z0', '0.0,0,0.0', 'nan,0,nan', '2.0,0,4.0', '0.0,1,1.0',
+                                                  '1.0,1,3.0', '2.0,1,5.0', '']
+
+    def test_raster_matrix_plot(self, tmp_path):
+        Z = np.array([[0., 1.], [2., np.nan], [4., 5.]])
+        plot = Plot(plot_name='matrix_plot_test', plot_path=str(tmp_path))
+        plot.add_matrix_plot([0, 1, 2], [10, 20], Z, raster=True)
+        tex = plot.build()
+        assert f'\\addplot graphics[xmin=-0.5, xmax=2.5, ymin=5.0, ymax=25.0]{{{tmp_path}/matrix_plot_test.png}};' in tex
+        assert 'point meta min=0.0, point meta max=5.0' in tex
+        assert 'colormap={python2latex}' in tex
+        assert os.path.exists(tmp_path / 'matrix_plot_test.png')
+        assert str(tmp_path / 'matrix_plot_test.png') in plot.collect_data_files()
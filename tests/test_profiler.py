@@ -0,0 +1,73 @@
+import json
+import os
+import asyncio
+import threading
+
+from python2latex import Document, Table, Plot, BuildProfiler
+from python2latex.plot import _Plot
+
+
+class TestBuildProfiler:
+    def teardown(self):
+        _Plot.plot_count = 0
+
+    def test_build_with_profile(self):
+        doc = Document('Doc')
+        sec = doc.new_section('Results')
+        sec.add_text('Some text')
+        table = sec.new(Table((2, 2), label='results'))
+        table[0, 0] = 1.
+        plot = sec.new(Plot([1, 2], [3, 4], plot_name='plot_test'))
+        tex = doc.build(False, False, False, profile=True)
+        os.remove('plot_test.csv')
+
+        profile = doc.build_profile
+        assert profile.by_class['Section']['calls'] == 1
+        assert 0 < profile.by_class['Section']['bytes'] < profile.by_class['Document']['bytes'] < len(tex)
+        assert 'Section Results' in profile.by_name
+        assert 'Table results' in profile.by_name
+        assert 'Plot plot_test' in profile.by_name
+        assert profile.operations['Plot.save_to_csv plot_test']['calls'] == 1
+        assert 'Per class:' in profile.report()
+
+    def test_build_with_profile_ignores_workers(self):
+        doc = Document('Doc')
+        for i in range(2):
+            doc.new_section(f'Section {i}').add_text('Some text')
+        tex = doc.build(False, False, False, profile=True, workers=2)
+        assert tex == doc.build(False, False, False)
+        assert 'Section Section 0' in doc.build_profile.by_name
+        assert 'Section Section 1' in doc.build_profile.by_name
+
+    def test_profiler_inactive_outside_context(self):
+        with BuildProfiler() as profiler:
+            assert BuildProfiler.current() is profiler
+        assert BuildProfiler.current() is None
+
+    def test_profiler_does_not_record_builds_of_other_threads(self):
+        doc = Document('Doc')
+        doc += 'Some text'
+        other_doc = Document('Other')
+        other_doc.new_section('Other section')
+        with BuildProfiler() as profiler:
+            thread = threading.Thread(target=other_doc.build, args=(False, False, False))
+            thread.start()
+            thread.join()
+            doc.build(False, False, False)
+        assert profiler.by_class['Document']['calls'] == 1
+        assert 'Section' not in profiler.by_class
+
+    def test_profiler_records_async_build(self):
+        doc = Document('Doc')
+        doc.new_section('Results')
+        with BuildProfiler() as profiler:
+            asyncio.run(doc.build_async(False, False, False))
+        assert profiler.by_class['Section']['calls'] == 1
+
+    def test_to_json(self):
+        doc = Document('Doc')
+        doc += 'Some text'
+        with BuildProfiler() as profiler:
+            doc.build(False, False, False)
+        results = json.loads(profiler.to_json())
+        assert results['by_class']['Document']['calls'] == 1
@@ -0,0 +1,50 @@
+import io
+import struct
+import zlib
+
+import numpy as np
+
+from python2latex.raster import apply_colormap, finite_range, pgfplots_colormap, write_png, viridis
+
+
+def read_png(data):
+    assert data[:8] == b'\x89PNG\r\n\x1a\n'
+    chunks, position = [], 8
+    while position < len(data):
+        length, = struct.unpack('>I', data[position:position + 4])
+        chunk_type, content = data[position + 4:position + 8], data[position + 8:position + 8 + length]
+        crc, = struct.unpack('>I', data[position + 8 + length:position + 12 + length])
+        assert crc == zlib.crc32(chunk_type + content)
+        chunks.append((chunk_type, content))
+        position += 12 + length
+    width, height, *_ = struct.unpack('>IIBBBBB', chunks[0][1])
+    pixels = zlib.decompress(b''.join(content for chunk_type, content in chunks if chunk_type == b'IDAT'))
+    rows = np.frombuffer(pixels, dtype=np.uint8).reshape(height, 1 + 4 * width)
+    assert (rows[:, 0] == 0).all()
+    return rows[:, 1:].reshape(height, width, 4)
+
+
+def test_apply_colormap():
+    rgba = apply_colormap([0, 5, 10, 20, float('nan')], 0, 10)
+    assert rgba[0].tolist() == [*viridis[0], 255]
+    assert rgba[1].tolist() == [*viridis[4], 255]
+    assert rgba[2].tolist() == rgba[3].tolist() == [*viridis[-1], 255]
+    assert rgba[4, 3] == 0
+
+
+def test_finite_range():
+    assert finite_range(np.array([[1, np.nan], [-np.inf, 3]])) == (1, 3)
+    assert finite_range(np.array([[2., 2.]])) == (2, 3)
+    assert finite_range(np.array([[np.nan]])) == (0, 1)
+
+
+def test_write_png_by_blocks():
+    image = np.random.RandomState(42).randint(0, 256, (5, 3, 4)).astype(np.uint8)
+    file = io.BytesIO()
+    write_png(file, (image[start:start + 2] for start in range(0, 5, 2)), width=3, height=5)
+    assert (read_png(file.getvalue()) == image).all()
+
+
+def test_pgfplots_colormap():
+    colormap = pgfplots_colormap('cm', [(0, 0, 0), (255, 255, 255)])
+    assert colormap == '{cm}{rgb255(0cm)=(0,0,0); rgb255(1cm)=(255,255,255)}'
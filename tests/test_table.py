@@ -35,6 +35,15 @@ class TestTable:
         assert three_by_three_table.data[1, 0] == 'Spam'
         assert three_by_three_table.data[2, 1] == 'Egg'
 
+    def test_setitem_invalidates_incremental_build(self):
+        table = Table((1, 1), as_float_env=False)
+        env = TexEnvironment('env')
+        env += table
+        table[0, 0] = 'Spam'
+        assert 'Spam' in env.build(incremental=True)
+        table[0, 0] = 'Egg'
+        assert 'Egg' in env.build(incremental=True)
+
 
 class TestSelectedArea:
     def setup(self):
@@ -337,3 +346,29 @@ def test_table_with_highlight_best():
 
 def test_table_with_highlight_best_with_equalities():
     pass
+
+
+def test_table_collects_packages_of_highlights():
+    def colored(value):
+        command = TexCommand('textcolor', 'red', value)
+        command.add_package('xcolor')
+        return command
+
+    table = Table((2, 2))
+    table[:, :] = [[1, 2], [3, 4]]
+    table[0, 0].highlight(colored)
+    table[1, 1].change_format(colored)
+    assert r'\textcolor{red}{1}' in table.build()
+    packages, _ = table.collect_requirements()
+    assert 'xcolor' in packages
+
+
+def test_table_build_is_repeatable():
+    table = Table((2, 2), caption='Caption', label='label')
+    table[0, 0] = 1.2345
+    table[1, :] = 'Multicell'
+    table[0].highlight_best()
+    table[0].add_rule()
+    first_build = table.build()
+    assert table.build() == first_build
+    assert table.data[0, 0] == 1.2345
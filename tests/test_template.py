@@ -1,4 +1,5 @@
 import sys, os
+import asyncio
 import pytest
 from inspect import cleandoc
 
@@ -161,3 +162,14 @@ class TestTemplate:
         finally:
             for extension in ['tex', 'log', 'pdf', 'aux']:
                 os.remove(filenames[0] + f'_rendered.{extension}')
+
+    def test_render_async_without_compiling(self):
+        template = Template(filenames[0])
+        template.anchors['anchor1'] = Subsection('Test')
+
+        try:
+            asyncio.run(template.render_async(compile_to_pdf=False))
+            with open(filenames[0] + '_rendered.tex', 'r') as file:
+                assert r'\begin{subsection}{Test}' in file.read()
+        finally:
+            os.remove(filenames[0] + '_rendered.tex')
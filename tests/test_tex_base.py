@@ -1,6 +1,207 @@
+import os
+import pickle
+import shutil
+import asyncio
+from subprocess import CalledProcessError
+
+from pytest import raises
+
+from python2latex import tex_base
+from python2latex.latex_log import LatexError
 from python2latex.tex_base import *
 
 
+class TestTexFile:
+    def test_compile_to_pdf_skip_unchanged(self, monkeypatch):
+        filepath = './some_tex_file_path'
+        calls = []
+
+        def fake_call(command, **kwargs):
+            calls.append(command)
+            open(os.path.join(filepath, 'file.pdf'), 'w').close()
+            return 0
+
+        monkeypatch.setattr(tex_base, 'call', fake_call)
+        tex_file = TexFile('file', filepath)
+        data_file = os.path.join(filepath, 'data.csv')
+        try:
+            tex_file.save('tex')
+            with open(data_file, 'w') as file:
+                file.write('1,2')
+            assert tex_file.compile_to_pdf(skip_unchanged=True, data_files=[data_file])
+            assert not tex_file.compile_to_pdf(skip_unchanged=True, data_files=[data_file])
+            with open(data_file, 'w') as file:
+                file.write('1,3')
+            assert tex_file.compile_to_pdf(skip_unchanged=True, data_files=[data_file])
+            tex_file.save('other tex')
+            assert tex_file.compile_to_pdf(skip_unchanged=True, data_files=[data_file])
+            os.remove(tex_file.pdf_path)
+            assert tex_file.compile_to_pdf(skip_unchanged=True, data_files=[data_file])
+            assert tex_file.compile_to_pdf(data_files=[data_file])
+            assert len(calls) == 5
+        finally:
+            shutil.rmtree(filepath)
+
+    def test_compile_to_pdf_failure_removes_manifest(self, monkeypatch):
+        filepath = './some_tex_file_path'
+        return_codes = [0, 1]
+
+        def fake_call(command, **kwargs):
+            open(os.path.join(filepath, 'file.pdf'), 'w').close()
+            return return_codes.pop(0)
+
+        monkeypatch.setattr(tex_base, 'call', fake_call)
+        tex_file = TexFile('file', filepath)
+        try:
+            tex_file.save('tex')
+            assert tex_file.compile_to_pdf(skip_unchanged=True)
+            assert os.path.exists(tex_file.manifest_path)
+            with raises(LatexError):
+                tex_file.compile_to_pdf()
+            assert not os.path.exists(tex_file.manifest_path)
+        finally:
+            shutil.rmtree(filepath)
+
+    def test_compile_to_pdf_with_format_cache(self, monkeypatch):
+        filepath = './some_tex_file_path'
+        format_cache = os.path.join(filepath, 'formats')
+        commands = []
+
+        def fake_call(command, cwd=None, **kwargs):
+            commands.append(command)
+            if '-ini' in command:
+                job_name = command[3][len('-jobname='):]
+                open(os.path.join(cwd, job_name + '.fmt'), 'w').close()
+            return 0
+
+        monkeypatch.setattr(tex_base, 'call', fake_call)
+        tex_files = [TexFile(f'file{i}', filepath) for i in range(3)]
+        try:
+            tex_files[0].save('\\documentclass{article}\n\\begin{document}\nfirst\n\\end{document}')
+            tex_files[1].save('\\documentclass{article}\n\\begin{document}\nsecond\n\\end{document}')
+            tex_files[2].save('\\documentclass{standalone}\n\\begin{document}\nthird\n\\end{document}')
+            for tex_file in tex_files:
+                tex_file.compile_to_pdf(format_cache=format_cache)
+
+            dumps = [command for command in commands if '-ini' in command]
+            compilations = [command for command in commands if '-ini' not in command]
+            assert len(dumps) == 2
+            formats = [command[2] for command in compilations]
+            assert formats[0] == formats[1] != formats[2]
+            assert all(os.path.exists(fmt[len('-fmt='):] + '.fmt') for fmt in formats)
+            assert not [name for name in os.listdir(format_cache) if name.endswith('.tmp')]
+        finally:
+            shutil.rmtree(filepath)
+
+    def test_compile_to_pdf_multiple_passes(self, monkeypatch):
+        filepath = './some_tex_file_path'
+        tex_file = TexFile('file', filepath)
+        logs = []
+
+        def fake_call(command, **kwargs):
+            log = logs.pop(0)
+            with open(tex_file.log_path, 'w') as file:
+                file.write(log)
+            with open(tex_file.aux_path, 'w') as file:
+                file.write(log)  # The aux file changes when the log changes.
+            return 0
+
+        monkeypatch.setattr(tex_base, 'call', fake_call)
+        try:
+            tex_file.save('tex')
+            logs = ['LaTeX Warning: Label(s) may have changed. Rerun to get cross-references right.', 'ok', 'ok', 'ok']
+            tex_file.compile_to_pdf(max_passes=5)
+            assert logs == ['ok']  # The third pass did not change the aux file and did not ask to rerun
+
+            logs = ['Rerun to get', 'Rerun to get', 'Rerun to get', 'ok']
+            tex_file.compile_to_pdf(max_passes=3)
+            assert logs == ['ok']  # Capped
+
+            logs = ['Rerun to get', 'ok']
+            tex_file.compile_to_pdf()
+            assert logs == ['ok']  # Only one pass by default
+        finally:
+            shutil.rmtree(filepath)
+
+    def test_compile_to_pdf_parses_log(self, monkeypatch):
+        filepath = './some_tex_file_path'
+        tex_file = TexFile('file', filepath)
+        log = 'Output written on file.pdf (3 pages, 100 bytes).'
+
+        def fake_call(command, **kwargs):
+            with open(tex_file.log_path, 'w') as file:
+                file.write(log)
+            return 0 if log.startswith('Output') else 1
+
+        monkeypatch.setattr(tex_base, 'call', fake_call)
+        try:
+            tex_file.save('tex')
+            tex_file.compile_to_pdf()
+            assert tex_file.log.pages == 3
+            assert tex_file.log.passes == 1
+            assert tex_file.log.time >= 0
+
+            log = '! Undefined control sequence.\nl.3 \\foo'
+            with raises(LatexError) as error:
+                tex_file.compile_to_pdf()
+            assert error.value.log.errors[0].line == 3
+            assert tex_file.log is error.value.log
+        finally:
+            shutil.rmtree(filepath)
+
+    def test_compile_to_pdf_fallback_engine(self, monkeypatch):
+        filepath = './some_tex_file_path'
+        tex_file = TexFile('file', filepath, fallback_engine='lualatex')
+        engines = []
+
+        def fake_call(command, **kwargs):
+            engines.append(command[0])
+            with open(tex_file.log_path, 'w') as file:
+                if command[0] == 'pdflatex':
+                    file.write('! TeX capacity exceeded, sorry [main memory size=5000000].')
+                    return 1
+                file.write('Output written on file.pdf (1 page, 100 bytes).')
+                return 0
+
+        monkeypatch.setattr(tex_base, 'call', fake_call)
+        try:
+            tex_file.save('tex')
+            tex_file.compile_to_pdf()
+            assert engines == ['pdflatex', 'lualatex']
+            assert tex_file.log.engine == 'lualatex'
+            assert tex_file.log.pages == 1
+
+            tex_file.fallback_engine = None
+            with raises(LatexError) as error:
+                tex_file.compile_to_pdf()
+            assert error.value.log.capacity_exceeded
+            assert error.value.cmd[0] == 'pdflatex'
+
+            tex_file.engine = 'xelatex'
+            tex_file.compile_to_pdf()
+            assert engines[-1] == 'xelatex'
+        finally:
+            shutil.rmtree(filepath)
+
+    def test_compile_to_pdf_async_failure(self, monkeypatch):
+        class FakeProcess:
+            async def wait(self):
+                return 1
+
+        async def fake_create_subprocess_exec(*command, **kwargs):
+            return FakeProcess()
+
+        monkeypatch.setattr(asyncio, 'create_subprocess_exec', fake_create_subprocess_exec)
+        filepath = './some_tex_file_path'
+        tex_file = TexFile('file', filepath)
+        try:
+            tex_file.save('tex')
+            with raises(CalledProcessError):
+                asyncio.run(tex_file.compile_to_pdf_async())
+        finally:
+            shutil.rmtree(filepath)
+
+
 class TestTexObject:
     def setup(self):
         self.tex_obj = TexObject('DefaultTexObject')
@@ -20,9 +221,32 @@ class TestTexObject:
         assert self.tex_obj.packages[package_name].options == ['spam', 'egg']
         assert self.tex_obj.packages[package_name].kwoptions == {'answer': 42, 'question': "We don't know"}
 
+    def test_add_package_merges_options_in_order(self):
+        self.tex_obj.add_package('xcolor', 'dvipsnames')
+        self.tex_obj.add_package('xcolor', 'table', 'dvipsnames')
+        assert self.tex_obj.packages['xcolor'].options == ('dvipsnames', 'table')
+
     def test_repr(self):
         assert repr(self.tex_obj) == 'TexObject DefaultTexObject'
 
+    def test_collect_requirements_merges_nested_objects(self):
+        nested = TexObject('Nested')
+        nested.add_package('package', 'egg', answer=42)
+        nested.add_package('other')
+        nested.add_to_preamble(r'\newcommand{\spam}{spam}')
+        command = TexCommand('command', nested)
+        outer = TexCommand('outer', options=[command])
+        outer.add_package('package', 'spam')
+        outer.add_to_preamble(r'\newcommand{\spam}{spam}')
+
+        packages, preamble = outer.collect_requirements()
+        assert list(packages) == ['package', 'other']
+        assert packages['package'].options == ('spam', 'egg')
+        assert packages['package'].kwoptions == {'answer': 42}
+        assert preamble == [r'\newcommand{\spam}{spam}']
+        assert outer.packages['package'].options == ['spam']
+        assert command.packages == {}
+
     def test_build_empty(self):
         assert self.tex_obj.build() == ''
 
@@ -65,6 +289,24 @@ class TestTexCommand:
     def test_str(self):
         assert f"{TexCommand('test')}" == r'\test'
 
+    def test_compact_representation(self):
+        command = TexCommand('test')
+        assert not hasattr(command, '__dict__')
+        assert command._packages is None and command._preamble is None
+        command.add_package('package')
+        assert 'package' in command.packages
+
+    def test_pickle(self):
+        command = TexCommand('test', 'param', options='spam', top='2cm')
+        command.add_package('package')
+        command._build_cache = ('cached', )
+        command._add_parent(TexObject('parent'))
+        unpickled_command = pickle.loads(pickle.dumps(command))
+        assert unpickled_command.build() == command.build()
+        assert 'package' in unpickled_command.packages
+        assert unpickled_command._build_cache is None
+        assert unpickled_command._parents == ()
+
 
 def test_bold():
     assert bold('test').build() == r'\textbf{test}'
@@ -140,3 +140,82 @@ class TestTexEnvironment:
             text 2
             \end{test}
             ''')
+
+    def test_iter_build_yields_non_empty_parts(self):
+        env = TexEnvironment('test')
+        env += 'text 1'
+        env += ''
+        sub_env = env.new(TexEnvironment('sub'))
+        sub_env += 'text 2'
+        assert list(env.iter_build()) == [r'\begin{test}', 'text 1', r'\begin{sub}', 'text 2', r'\end{sub}', r'\end{test}']
+        assert '\n'.join(env.iter_build()) == env.build()
+
+    def test_build_very_deep_env(self):
+        root = env = TexEnvironment('level')
+        for _ in range(5000):
+            env = env.new(TexEnvironment('level'))
+        env.add_package('tikz')
+        tex = root.build()
+        assert tex.count(r'\begin{level}') == 5001
+        assert r'\usepackage{tikz}' in root.build_preamble()
+
+    def test_incremental_build_reuses_clean_branches(self):
+        root = TexEnvironment('root')
+        clean = root.new(TexEnvironment('clean'))
+        clean += 'clean text'
+        dirty = root.new(TexEnvironment('dirty'))
+        dirty += 'dirty text'
+        assert root.build(incremental=True) == root.build()
+
+        built_parts = []
+        clean._build_parts = lambda: built_parts.append(clean) or []
+        dirty += 'more text'
+        assert root.build(incremental=True) == cleandoc(r'''
+            \begin{root}
+            \begin{clean}
+            clean text
+            \end{clean}
+            \begin{dirty}
+            dirty text
+            more text
+            \end{dirty}
+            \end{root}
+            ''')
+        assert built_parts == []
+
+    def test_incremental_build_of_very_deep_env_stores_each_part_once(self):
+        root = env = TexEnvironment('level')
+        for i in range(5000):
+            env = env.new(TexEnvironment('level'))
+            env += f'text {i}'
+        tex = root.build(incremental=True)
+        assert tex == root.build()
+        assert root._build_cache[0] == (r'\begin{level}', root.body[0], r'\end{level}')
+        assert root.build(incremental=True) == tex
+
+    def test_invalidate_after_in_place_modification(self):
+        root = TexEnvironment('root')
+        env = root.new(TexEnvironment('env'))
+        root.build(incremental=True)
+        env.body.append('Spam')
+        assert 'Spam' not in root.build(incremental=True)
+        env.invalidate()
+        assert 'Spam' in root.build(incremental=True)
+
+    def test_in_place_options_mutation_invalidates_cache(self):
+        root = TexEnvironment('root')
+        env = root.new(TexEnvironment('env'))
+        root.build(incremental=True)
+        env.kwoptions['answer'] = 42
+        assert r'\begin{env}[answer=42]' in root.build(incremental=True)
+        env.options.append('spam')
+        assert r'\begin{env}[spam, answer=42]' in root.build(incremental=True)
+        del env.kwoptions['answer']
+        assert r'\begin{env}[spam]' in root.build(incremental=True)
+
+    def test_options_mutation_invalidates_cache(self):
+        root = TexEnvironment('root')
+        env = root.new(TexEnvironment('env'))
+        root.build(incremental=True)
+        env.options += ('spam', )
+        assert r'\begin{env}[spam]' in root.build(incremental=True)
@@ -0,0 +1,30 @@
+from python2latex.traversal import *
+
+
+def expand(node):
+    return node if isinstance(node, list) else None
+
+
+def test_walk_events_order():
+    tree = ['a', ['b', 'c'], 'd']
+    events = [(event, node) for event, node, _ in walk(tree, expand)]
+    assert events == [(ENTER, tree), (LEAF, 'a'), (ENTER, tree[1]), (LEAF, 'b'), (LEAF, 'c'), (LEAVE, tree[1]),
+                      (LEAF, 'd'), (LEAVE, tree)]
+
+
+def test_walk_parents():
+    tree = ['a', ['b']]
+    parents = {node if isinstance(node, str) else id(node): parent for _, node, parent in walk(tree, expand)}
+    assert parents[id(tree)] is None
+    assert parents['a'] is tree
+    assert parents['b'] is tree[1]
+
+
+def test_walk_deep_tree_without_recursion():
+    tree = leaf = []
+    for _ in range(10000):
+        leaf.append([])
+        leaf = leaf[0]
+    leaf.append('deepest')
+    leaves = [node for event, node, _ in walk(tree, expand) if event == LEAF]
+    assert leaves == ['deepest']
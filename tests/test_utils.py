@@ -0,0 +1,61 @@
+import os
+import shutil
+
+from pytest import raises
+
+from python2latex.utils import hash_file, write_if_changed
+
+
+class TestWriteIfChanged:
+    def setup(self):
+        self.filepath = './some_utils_path'
+        os.makedirs(self.filepath, exist_ok=True)
+        self.path = os.path.join(self.filepath, 'file.tex')
+
+    def teardown(self):
+        shutil.rmtree(self.filepath)
+
+    def test_writes_new_file(self):
+        with write_if_changed(self.path, encoding='utf8') as file:
+            file.write('tex')
+        with open(self.path, encoding='utf8') as file:
+            assert file.read() == 'tex'
+        assert os.listdir(self.filepath) == ['file.tex']
+
+    def test_new_file_mode_follows_umask(self):
+        umask = os.umask(0o027)
+        try:
+            with write_if_changed(self.path) as file:
+                file.write('tex')
+        finally:
+            os.umask(umask)
+        if os.name == 'posix':
+            assert os.stat(self.path).st_mode & 0o777 == 0o640
+        assert os.listdir(self.filepath) == ['file.tex']
+
+    def test_unchanged_file_is_not_rewritten(self):
+        with write_if_changed(self.path) as file:
+            file.write('tex')
+        os.utime(self.path, (0, 0))
+        with write_if_changed(self.path) as file:
+            file.write('tex')
+        assert os.stat(self.path).st_mtime == 0
+        with write_if_changed(self.path) as file:
+            file.write('other tex')
+        assert os.stat(self.path).st_mtime != 0
+        assert os.listdir(self.filepath) == ['file.tex']
+
+    def test_file_is_untouched_on_error(self):
+        with write_if_changed(self.path) as file:
+            file.write('tex')
+        with raises(ValueError):
+            with write_if_changed(self.path) as file:
+                file.write('partial')
+                raise ValueError
+        with open(self.path) as file:
+            assert file.read() == 'tex'
+        assert os.listdir(self.filepath) == ['file.tex']
+
+
+def test_hash_file():
+    assert hash_file('./some_file_that_does_not_exist') is None